@@ -1,10 +1,17 @@
 from typing import Dict, Any, List, Optional
 import os, json
+from concurrent.futures import Future
 from google.cloud import firestore
+from google.api_core.exceptions import AlreadyExists
 from vertexai import init
 from vertexai.preview.generative_models import GenerativeModel
 from adk import Agent, action
-import feedparser
+from pipeline import Stage, run_pipeline
+from extract_cache import ExtractCache
+from feed_fetcher import FeedFetcher, feed_incident_id
+from ngo_sync import sync_ngos
+from planner_client import PlannerDispatcher
+from outbox import SqliteOutbox, FirestoreOutbox, OutboxConsumer
 
 
 # Optional imports for fallback HTTP dispatch
@@ -17,6 +24,55 @@ try:
 except Exception:
     _HAS_AGENT_CLIENT = False
 
+DEFAULT_FEED_URLS = [
+    "https://www.reliefweb.int/rss/updates.xml",
+    "https://feeds.bbci.co.uk/news/world/rss.xml",
+]
+
+# metadata/<doc> holding the incremental transcript watermark
+TRANSCRIPT_CURSOR_DOC = "datascout_transcripts_cursor"
+
+# Bump when the extraction prompts change so cached results are not reused
+EXTRACT_PROMPT_VERSION = "v1"
+
+
+def _strip_fences(text: Optional[str]) -> str:
+    content = (text or "").strip()
+    # Be defensive: strip accidental fences
+    if content.startswith("```"):
+        content = content.strip("` \n")
+        # In case someone wrapped with json
+        if content.startswith("json"):
+            content = content[4:].strip()
+    return content
+
+
+def _normalize_incident(obj: Dict[str, Any]) -> Dict[str, Any]:
+    # Normalize types
+    obj["needs"] = obj.get("needs", []) or []
+    if not isinstance(obj["needs"], list):
+        obj["needs"] = [str(obj["needs"])]
+    return obj
+
+
+def _reliefweb_ngo(f: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    name = f.get("name")
+    if not name:
+        return None
+    country = (f.get("country") or {}).get("name", "Unknown")
+
+    # simple heuristic: infer service from NGO type keywords
+    org_type = (f.get("type") or "").lower()
+    if "medical" in org_type or "health" in org_type:
+        service = "medical supplies"
+    elif "food" in org_type or "hunger" in org_type:
+        service = "food"
+    elif "shelter" in org_type or "housing" in org_type:
+        service = "shelter"
+    else:
+        service = "general aid"
+    return {"name": name, "service": service, "country": country}
+
 
 class DataScoutAgent(Agent):
     """
@@ -30,9 +86,45 @@ class DataScoutAgent(Agent):
         location = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
         init(project=project, location=location)
 
-        self.model = GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
+        model_name = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+        self.model = GenerativeModel(model_name)
         self.db = firestore.Client(database=os.getenv("GOOGLE_CLOUD_FIRESTORE_DB"))
 
+        # Number of texts packed into one extraction prompt
+        self.extract_batch_size = int(os.getenv("EXTRACT_BATCH_SIZE", "10"))
+
+        # Repeat texts skip Gemini entirely
+        self.extract_cache: Optional[ExtractCache] = None
+        if os.getenv("EXTRACT_CACHE", "1") == "1":
+            self.extract_cache = ExtractCache(
+                path=os.getenv("EXTRACT_CACHE_PATH", "/tmp/datascout_extract_cache.sqlite"),
+                model_name=model_name,
+                prompt_version=EXTRACT_PROMPT_VERSION,
+                ttl_seconds=float(os.getenv("EXTRACT_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+                memory_items=int(os.getenv("EXTRACT_CACHE_MEMORY_ITEMS", "1024")),
+                max_rows=int(os.getenv("EXTRACT_CACHE_MAX_ROWS", "100000")),
+            )
+
+        # RSS sources, fetched conditionally with entry-level dedup
+        self.feed_urls = [
+            u.strip()
+            for u in os.getenv("FEED_URLS", ",".join(DEFAULT_FEED_URLS)).split(",")
+            if u.strip()
+        ]
+        self.feed_fetcher = FeedFetcher(
+            path=os.getenv("FEED_STATE_PATH", "/tmp/datascout_feeds.sqlite"),
+            seen_ttl_seconds=float(os.getenv("FEED_SEEN_TTL_SECONDS", str(14 * 24 * 3600))),
+            max_workers=int(os.getenv("FEED_FETCH_WORKERS", "8")),
+            entries_per_feed=int(os.getenv("FEED_ENTRIES_PER_FEED", "10")),
+        )
+
+        # Pipelined ingestion: per-stage worker counts and queue bound
+        self.ingest_pipelined = os.getenv("INGEST_PIPELINED", "0") == "1"
+        self.extract_workers = int(os.getenv("EXTRACT_WORKERS", "4"))
+        self.persist_workers = int(os.getenv("PERSIST_WORKERS", "4"))
+        self.dispatch_workers = int(os.getenv("DISPATCH_WORKERS", "8"))
+        self.pipeline_queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+
         # Inter-agent config
         self.planner_agent_name = os.getenv("RESOURCE_PLANNER_AGENT_NAME", "resourceplanner-adk")
         self.planner_http_url = os.getenv("RESOURCE_PLANNER_URL")  # e.g., https://<run-url>/actions/plan_matches
@@ -45,6 +137,48 @@ class DataScoutAgent(Agent):
             except Exception:
                 self._planner_client = None
 
+        # Batched, keep-alive HTTP dispatch to plan_matches_batch
+        self.planner_dispatcher: Optional[PlannerDispatcher] = None
+        planner_batch = int(os.getenv("PLANNER_BATCH_SIZE", "20"))
+        planner_pool = int(os.getenv("PLANNER_POOL_SIZE", "4"))
+        if self.planner_http_url and os.getenv("PLANNER_BATCH_DISPATCH", "1") == "1":
+            self.planner_dispatcher = PlannerDispatcher(
+                self.planner_http_url,
+                batch_size=planner_batch,
+                flush_interval=float(os.getenv("PLANNER_FLUSH_INTERVAL", "0.25")),
+                pool_size=planner_pool,
+            )
+        self._http = requests.Session()
+
+        # Durable outbox: ingestion enqueues, a consumer drains into the planner
+        self.outbox = None
+        self.outbox_consumer: Optional[OutboxConsumer] = None
+        backend = os.getenv("OUTBOX_BACKEND", "").lower()
+        if backend == "sqlite":
+            self.outbox = SqliteOutbox(os.getenv("OUTBOX_PATH", "/tmp/datascout_outbox.sqlite"))
+        elif backend == "firestore":
+            self.outbox = FirestoreOutbox(self.db, collection=os.getenv("OUTBOX_COLLECTION", "outbox"))
+        if self.outbox is not None:
+            # Each outbox delivery is one incident, so the consumer's in-flight
+            # cap bounds how full a planner batch can get. With batched dispatch
+            # the default lets every pooled connection carry a full batch
+            # (PLANNER_BATCH_SIZE x PLANNER_POOL_SIZE) and claims that many at once;
+            # an OUTBOX_CONCURRENCY below PLANNER_BATCH_SIZE means partial batches
+            # sent on the PLANNER_FLUSH_INTERVAL timer.
+            concurrency = planner_batch * planner_pool if self.planner_dispatcher is not None else 8
+            concurrency = int(os.getenv("OUTBOX_CONCURRENCY", str(concurrency)))
+            self.outbox_consumer = OutboxConsumer(
+                self.outbox,
+                lambda p: self._deliver_to_planner(p.get("incident") or {}, incident_id=p.get("incident_id")),
+                concurrency=concurrency,
+                claim_size=int(os.getenv("OUTBOX_CLAIM_SIZE", str(max(50, concurrency)))),
+                base_delay=float(os.getenv("OUTBOX_BASE_DELAY", "2")),
+                max_delay=float(os.getenv("OUTBOX_MAX_DELAY", "300")),
+                max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8")),
+            )
+            if os.getenv("OUTBOX_CONSUMER", "1") == "1":
+                self.outbox_consumer.start()
+
     # ---------- capabilities ----------
 
     @action()
@@ -53,6 +187,11 @@ class DataScoutAgent(Agent):
         Convert raw disaster text to a compact incident JSON:
         {location, disaster_type, summary, needs: [str]}
         """
+        if self.extract_cache is not None:
+            cached = self.extract_cache.get(text)
+            if cached is not None:
+                return cached
+
         prompt = f"""
 Read this disaster update and output compact JSON with keys:
 location, disaster_type, summary, needs (array of strings).
@@ -60,26 +199,50 @@ Only return valid JSON. No markdown fences.
 Text: {text}
 """
         resp = self.model.generate_content(prompt)
-        content = (resp.text or "").strip()
-        # Be defensive: strip accidental fences
-        if content.startswith("```"):
-            content = content.strip("` \n")
-            # In case someone wrapped with json
-            if content.startswith("json"):
-                content = content[4:].strip()
+        content = _strip_fences(resp.text)
 
         try:
-            obj = json.loads(content)
+            obj = _normalize_incident(json.loads(content))
         except Exception:
-            obj = {"location": "unknown", "disaster_type": "unknown", "summary": content, "needs": []}
-        # Normalize types
-        obj["needs"] = obj.get("needs", []) or []
-        if not isinstance(obj["needs"], list):
-            obj["needs"] = [str(obj["needs"])]
+            # Not cached, so the next sighting gets another chance
+            return _normalize_incident(
+                {"location": "unknown", "disaster_type": "unknown", "summary": content, "needs": []}
+            )
+        if self.extract_cache is not None:
+            self.extract_cache.put(text, obj)
         return obj
 
     @action()
-    def ingest_from_transcripts(self, limit: int = 20) -> Dict[str, Any]:
+    def summarize_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Extract incidents for many texts with one Gemini call per batch.
+        Returns one incident JSON per input, in input order. Items missing from
+        a partial or malformed response are re-split and retried on their own.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            cached = self.extract_cache.get(text) if self.extract_cache is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, text))
+        self._extract_into(results, pending)
+        return results
+
+    @action()
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters and size of the extraction cache.
+        """
+        if self.extract_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.extract_cache.stats()}
+
+    @action()
+    def ingest_from_transcripts(
+        self, limit: int = 20, batch_size: Optional[int] = None, pipelined: Optional[bool] = None
+    ) -> Dict[str, Any]:
         """
         Read latest 'transcripts' documents and create incidents; dispatch each to planner.
         """
@@ -89,108 +252,397 @@ Text: {text}
             .limit(limit)
             .stream()
         )
-        created, dispatched = 0, 0
-        for d in docs:
-            text = d.to_dict().get("text", "")
-            if not text:
-                continue
-            inc = self.summarize_text(text)
-            _, ref = self._create_incident(inc)
-            created += 1
-            if self._dispatch_to_planner(inc, incident_id=ref.id):
-                dispatched += 1
+        texts = [t for t in ((d.to_dict() or {}).get("text", "") for d in docs) if t]
+        return self._ingest_texts(texts, batch_size, pipelined)
 
-        return {"created": created, "dispatched": dispatched}
+    @action()
+    def ingest_new_transcripts(
+        self,
+        page_size: int = 50,
+        max_pages: Optional[int] = 10,
+        batch_size: Optional[int] = None,
+        pipelined: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """
+        Incremental ingestion: page forward through 'transcripts' from the stored
+        (timestamp, doc id) watermark, oldest first. The cursor only advances after
+        a page is ingested, and each transcript maps to incident 'transcript_<id>',
+        so overlapping or retried runs never duplicate incidents. Incidents left
+        by a run that died before marking skip extraction and are re-dispatched
+        unless the planner has already matched them.
+        Input: { page_size?: 50, max_pages?: 10 (null = catch up fully) }
+        """
+        # Marks plus the cursor write must fit one WriteBatch (500 ops)
+        page_size = max(1, min(int(page_size), 400))
+        cursor_ref = self.db.collection("metadata").document(TRANSCRIPT_CURSOR_DOC)
+        cursor = cursor_ref.get().to_dict() or {}
+        transcripts = self.db.collection("transcripts")
+
+        incidents = self.db.collection("incidents")
+        created, dispatched, redispatched, scanned, pages = 0, 0, 0, 0, 0
+        while max_pages is None or pages < max_pages:
+            q = transcripts.order_by("timestamp").order_by("__name__")
+            if cursor.get("timestamp") is not None:
+                q = q.start_after({"timestamp": cursor["timestamp"], "__name__": cursor["doc_id"]})
+            page = list(q.limit(page_size).stream())
+            if not page:
+                break
+            pages += 1
+            scanned += len(page)
+
+            todo = [(d, d.to_dict() or {}) for d in page]
+            todo = [(d, data) for d, data in todo if data.get("text") and not data.get("incident_id")]
+
+            # One round trip to find incidents created before a crash
+            existing = {
+                snap.id: snap.to_dict() or {}
+                for snap in self.db.get_all([incidents.document(f"transcript_{d.id}") for d, _ in todo])
+                if snap.exists
+            } if todo else {}
+            retry = [
+                self._dispatch_async(inc, incident_id=inc_id)
+                for inc_id, inc in self._unmatched(existing).items()
+            ]
+            fresh = [(d, data) for d, data in todo if f"transcript_{d.id}" not in existing]
+            res = self._ingest_texts(
+                [data["text"] for _, data in fresh],
+                batch_size,
+                pipelined,
+                incident_ids=[f"transcript_{d.id}" for d, _ in fresh],
+            )
+            created += res["created"]
+            redispatched += sum(1 for f in retry if f.result())
+            dispatched += res["dispatched"]
+
+            # Mark transcripts and move the watermark in one commit
+            batch = self.db.batch()
+            for d, _ in todo:
+                batch.update(d.reference, {
+                    "incident_id": f"transcript_{d.id}",
+                    "processed_at": firestore.SERVER_TIMESTAMP,
+                })
+            last = page[-1]
+            cursor = {"timestamp": (last.to_dict() or {}).get("timestamp"), "doc_id": last.id}
+            batch.set(cursor_ref, {**cursor, "updated_at": firestore.SERVER_TIMESTAMP})
+            batch.commit()
+
+            if len(page) < page_size:
+                break
+
+        return {
+            "created": created,
+            "dispatched": dispatched,
+            "redispatched": redispatched,
+            "scanned": scanned,
+            "pages": pages,
+            "cursor": {"doc_id": cursor.get("doc_id")},
+        }
 
     @action()
-    def ingest_from_feed(self, items: List[str]) -> Dict[str, Any]:
+    def ingest_from_feed(
+        self, items: List[str], batch_size: Optional[int] = None, pipelined: Optional[bool] = None
+    ) -> Dict[str, Any]:
         """
         Ingest already-fetched RSS/news items (array of strings). Create incidents and dispatch.
         """
-        created, dispatched = 0, 0
-        for raw in items:
-            inc = self.summarize_text(raw)
-            _, ref = self._create_incident(inc)
-            created += 1
-            if self._dispatch_to_planner(inc, incident_id=ref.id):
-                dispatched += 1
-        return {"created": created, "dispatched": dispatched}
+        return self._ingest_texts(items, batch_size, pipelined)
     
     @action()
-    def fetch_and_ingest(self):
+    def fetch_and_ingest(
+        self,
+        urls: Optional[List[str]] = None,
+        batch_size: Optional[int] = None,
+        pipelined: Optional[bool] = None,
+    ) -> Dict[str, Any]:
         """
         Automatically fetch top disaster RSS/news items and process them.
+        Feeds are fetched concurrently with conditional GETs; only entries not
+        seen before reach extraction, so an unchanged feed costs a 304. Each
+        entry maps to incident 'feed_<hash of guid>' and is only marked seen
+        once that incident exists, so failed entries are retried next run.
         """
-        urls = [
-            "https://www.reliefweb.int/rss/updates.xml",
-            "https://feeds.bbci.co.uk/news/world/rss.xml"
-        ]
-        items = []
-        for u in urls:
-            feed = feedparser.parse(u)
-            for e in feed.entries[:10]:
-                items.append(e.title + " " + e.summary)
-        return self.ingest_from_feed(items=items)
+        results = self.feed_fetcher.fetch(urls or self.feed_urls)
+        entries = [e for r in results for e in r["entries"]]
+        ids = [feed_incident_id(e["guid"]) for e in entries]
+        out = self._ingest_texts([e["text"] for e in entries], batch_size, pipelined, incident_ids=ids)
+
+        incidents = self.db.collection("incidents")
+        stored = {
+            snap.id for snap in self.db.get_all([incidents.document(i) for i in ids]) if snap.exists
+        } if ids else set()
+        self.feed_fetcher.commit(results, ingested={e["guid"] for e, i in zip(entries, ids) if i in stored})
+        out["not_ingested"] = len(ids) - len(stored)
+        out["feeds"] = {
+            r["url"]: r.get("error") or ("not_modified" if r["not_modified"] else len(r["entries"]))
+            for r in results
+        }
+        return out
     
 
     @action()
-    def update_ngos_from_reliefweb(self, limit: int = 200) -> Dict[str, Any]:
+    def update_ngos_from_reliefweb(
+        self, limit: Optional[int] = None, page_size: int = 1000, remove_missing: bool = True
+    ) -> Dict[str, Any]:
         """
         Pulls factual NGO data from ReliefWeb API and updates Firestore 'ngos' collection.
         Only stores key fields: name, service (if available), country.
+        Streams every page of the sources API and writes only new or changed
+        documents in batches. Stale 'reliefweb' documents are removed only on a
+        full (uncapped) sync.
         """
+        try:
+            records = list(self._iter_reliefweb_ngos(limit=limit, page_size=page_size))
+        except RuntimeError as e:
+            return {"error": str(e)}
+
+        counts = sync_ngos(
+            self.db,
+            records,
+            source="reliefweb",
+            remove_missing=remove_missing and limit is None,
+        )
+        return {"status": "updated", "count": len(records), "collection": "ngos", **counts}
 
-        url = f"https://api.reliefweb.int/v1/sources?appname=crisisconnect&profile=list&limit={limit}"
-        resp = requests.get(url, timeout=15)
-        if resp.status_code != 200:
-            return {"error": f"ReliefWeb API returned {resp.status_code}"}
-
-        data = resp.json()
-        docs = data.get("data", [])
 
-        added = 0
-        for d in docs:
-            f = d.get("fields", {})
-            name = f.get("name")
-            country = (f.get("country") or {}).get("name", "Unknown")
-            if not name:
-                continue
 
-            # simple heuristic: infer service from NGO type keywords
-            org_type = (f.get("type") or "").lower()
-            if "medical" in org_type or "health" in org_type:
-                service = "medical supplies"
-            elif "food" in org_type or "hunger" in org_type:
-                service = "food"
-            elif "shelter" in org_type or "housing" in org_type:
-                service = "shelter"
-            else:
-                service = "general aid"
+    @action()
+    def drain_outbox(self, max_items: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Deliver due outbox items to the planner now (e.g. from a scheduler when
+        the background consumer is disabled).
+        """
+        if self.outbox_consumer is None:
+            return {"error": "outbox not configured"}
+        return self.outbox_consumer.drain(max_items=max_items)
 
-            doc_id = name.lower().replace(" ", "_")
-            self.db.collection("ngos").document(doc_id).set({
-                "name": name,
-                "service": service,
-                "country": country,
-                "source": "reliefweb",
-            })
-            added += 1
+    @action()
+    def outbox_stats(self) -> Dict[str, Any]:
+        """
+        Queue depth by state plus delivered/retried/dead-lettered counters.
+        """
+        if self.outbox_consumer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.outbox_consumer.stats()}
 
-        return {"status": "updated", "count": added, "collection": "ngos"}
+    # ---------- helpers ----------
 
+    def _iter_reliefweb_ngos(self, limit: Optional[int] = None, page_size: int = 1000):
+        """
+        Yield (doc_id, ngo) for every ReliefWeb source, following offset pages.
+        """
+        page_size = max(1, min(int(page_size), 1000))  # API maximum
+        offset, yielded = 0, 0
+        with requests.Session() as session:
+            while limit is None or yielded < limit:
+                size = page_size if limit is None else min(page_size, limit - yielded)
+                resp = session.get(
+                    "https://api.reliefweb.int/v1/sources",
+                    params={"appname": "crisisconnect", "profile": "list", "limit": size, "offset": offset},
+                    timeout=15,
+                )
+                if resp.status_code != 200:
+                    raise RuntimeError(f"ReliefWeb API returned {resp.status_code}")
+
+                docs = resp.json().get("data", [])
+                for d in docs:
+                    ngo = _reliefweb_ngo(d.get("fields", {}))
+                    yielded += 1
+                    if ngo:
+                        yield ngo["name"].lower().replace(" ", "_"), ngo
+                if len(docs) < size:
+                    break
+                offset += len(docs)
+
+    def _ingest_texts(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        pipelined: Optional[bool] = None,
+        incident_ids: Optional[List[Optional[str]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Extract, create and dispatch incidents for texts. When incident_ids are
+        given, incidents use those document ids and ones that already exist are
+        not created again, which makes re-ingesting the same source idempotent;
+        they are still dispatched if the planner has no match for them yet.
+        """
+        size = max(1, int(batch_size or self.extract_batch_size))
+        ids = list(incident_ids) if incident_ids is not None else [None] * len(texts)
+        if self.ingest_pipelined if pipelined is None else pipelined:
+            return self._ingest_pipelined(texts, ids, size)
+
+        created, pending = 0, []
+        for start in range(0, len(texts), size):
+            incs = self.summarize_batch(texts[start:start + size])
+            for inc, doc_id in zip(incs, ids[start:start + size]):
+                _, ref = self._create_incident(inc, doc_id)
+                if ref is not None:
+                    created += 1
+                    pending.append(self._dispatch_async(inc, incident_id=ref.id))
+                elif self._unmatched({doc_id: inc}):
+                    pending.append(self._dispatch_async(inc, incident_id=doc_id))
+        dispatched = sum(1 for f in pending if f.result())
+        return {"created": created, "dispatched": dispatched}
 
+    def _ingest_pipelined(self, texts: List[str], ids: List[Optional[str]], size: int) -> Dict[str, Any]:
+        """
+        Extract, persist and dispatch as concurrent stages with bounded queues,
+        so wall time tracks the slowest stage rather than the sum of all three.
+        """
+        batches = ((texts[start:start + size], ids[start:start + size]) for start in range(0, len(texts), size))
+
+        def extract(batch):
+            chunk, chunk_ids = batch
+            return list(zip(self.summarize_batch(chunk), chunk_ids))
+
+        def persist(item):
+            inc, doc_id = item
+            _, ref = self._create_incident(inc, doc_id)
+            if ref is not None:
+                return [(inc, ref.id, True)]
+            return [(inc, doc_id, False)] if self._unmatched({doc_id: inc}) else []
+
+        def dispatch(item):
+            inc, incident_id, created = item
+            return [(created, self._dispatch_async(inc, incident_id=incident_id))]
+
+        results, errors = run_pipeline(
+            batches,
+            [
+                Stage("extract", extract, self.extract_workers),
+                Stage("persist", persist, self.persist_workers),
+                Stage("dispatch", dispatch, self.dispatch_workers),
+            ],
+            queue_size=self.pipeline_queue_size,
+        )
+        out = {
+            "created": sum(1 for created, _ in results if created),
+            "dispatched": sum(1 for _, f in results if f.result()),
+        }
+        if errors:
+            out["errors"] = [f"{stage}: {err}" for stage, err in errors]
+        return out
 
-    # ---------- helpers ----------
+    def _extract_into(self, results: List[Optional[Dict[str, Any]]], items: List[tuple]) -> None:
+        """
+        Fill results[i] for each (i, text) in items, splitting the batch until
+        every item has a well-formed answer.
+        """
+        if not items:
+            return
+        if len(items) == 1:
+            i, text = items[0]
+            results[i] = self.summarize_text(text)
+            return
+
+        parsed = self._extract_batch(items)
+        for i, obj in parsed.items():
+            results[i] = obj
+        bad = [(i, text) for i, text in items if i not in parsed]
+        if len(bad) == len(items):
+            mid = len(bad) // 2
+            self._extract_into(results, bad[:mid])
+            self._extract_into(results, bad[mid:])
+        else:
+            self._extract_into(results, bad)
+
+    def _extract_batch(self, items: List[tuple]) -> Dict[int, Dict[str, Any]]:
+        """
+        One Gemini call for a list of (id, text). Returns {id: incident} for the
+        entries that came back well-formed; anything else is left out.
+        """
+        payload = json.dumps([{"id": i, "text": text} for i, text in items], ensure_ascii=False)
+        prompt = f"""
+Read each disaster update below and output a JSON array with exactly one object
+per input, each with keys: id (copied from the input), location, disaster_type,
+summary, needs (array of strings).
+Only return valid JSON. No markdown fences.
+Inputs: {payload}
+"""
+        try:
+            resp = self.model.generate_content(prompt)
+            arr = json.loads(_strip_fences(resp.text))
+        except Exception:
+            return {}
+        if not isinstance(arr, list):
+            return {}
+
+        texts = dict(items)
+        out: Dict[int, Dict[str, Any]] = {}
+        for obj in arr:
+            if not isinstance(obj, dict):
+                continue
+            try:
+                i = int(obj.pop("id"))
+            except Exception:
+                continue
+            if i in texts and "summary" in obj:
+                out[i] = _normalize_incident(obj)
+                if self.extract_cache is not None:
+                    self.extract_cache.put(texts[i], out[i])
+        return out
 
-    def _create_incident(self, inc: Dict[str, Any]):
+    def _create_incident(self, inc: Dict[str, Any], doc_id: Optional[str] = None):
         # Add server-side timestamp to help downstream ordering
         payload = {
             **inc,
             "created_at": firestore.SERVER_TIMESTAMP,
         }
-        ref = self.db.collection("incidents").add(payload)[1]
+        if doc_id is None:
+            ref = self.db.collection("incidents").add(payload)[1]
+            return payload, ref
+
+        # Deterministic id: a second create() for the same source is a no-op
+        ref = self.db.collection("incidents").document(doc_id)
+        try:
+            ref.create(payload)
+        except AlreadyExists:
+            return payload, None
         return payload, ref
 
+    def _unmatched(self, incidents: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        The {incident_id: incident} entries the planner has no 'matches' document
+        for, ready to re-dispatch (planning is idempotent by incident id).
+        """
+        if not incidents:
+            return {}
+        matches = self.db.collection("matches")
+        matched = {snap.id for snap in self.db.get_all([matches.document(i) for i in incidents]) if snap.exists}
+        # The stored server timestamp is not JSON-serializable for dispatch
+        return {
+            i: {k: v for k, v in inc.items() if k != "created_at"}
+            for i, inc in incidents.items()
+            if i not in matched
+        }
+
+    def _dispatch_async(self, inc: Dict[str, Any], incident_id: Optional[str] = None) -> Future:
+        """
+        With an outbox configured, enqueue and resolve immediately (delivery is
+        the consumer's job); otherwise hand straight to the planner.
+        """
+        if self.outbox is not None:
+            try:
+                self.outbox.enqueue({"incident": inc, "incident_id": incident_id})
+                fut: Future = Future()
+                fut.set_result(True)
+                return fut
+            except Exception:
+                pass
+        return self._deliver_to_planner(inc, incident_id=incident_id)
+
+    def _deliver_to_planner(self, inc: Dict[str, Any], incident_id: Optional[str] = None) -> Future:
+        """
+        Queue the incident for a batched plan_matches_batch call when HTTP
+        batching is configured; otherwise dispatch inline. Resolves to the same
+        bool _dispatch_to_planner returns.
+        """
+        if self._planner_client is None and self.planner_dispatcher is not None:
+            return self.planner_dispatcher.submit(inc, incident_id)
+        fut: Future = Future()
+        fut.set_result(self._dispatch_to_planner(inc, incident_id=incident_id))
+        return fut
+
     def _dispatch_to_planner(self, inc: Dict[str, Any], incident_id: Optional[str] = None) -> bool:
         """
         Preferred: use ADK AgentClient.
@@ -213,7 +665,7 @@ Text: {text}
                 url = self.planner_http_url.rstrip("/")
                 if not url.endswith("/actions/plan_matches"):
                     url = f"{url}/actions/plan_matches"
-                r = requests.post(url, json=req, timeout=10)
+                r = self._http.post(url, json=req, timeout=10)
                 return r.status_code // 100 == 2
             except Exception:
                 return False
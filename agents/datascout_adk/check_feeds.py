@@ -0,0 +1,105 @@
+# FeedFetcher against a local HTTP stand-in serving the fixture feeds.
+#
+#   python check_feeds.py [--fixtures fixtures/feeds]
+#
+# The stand-in serves every *.xml under --fixtures at /<name>.xml with an ETag
+# and answers If-None-Match with 304, like the real feed hosts; /broken.xml
+# returns 500 and unknown paths 404. Checks: first fetch, cross-feed dedup,
+# conditional GET after commit, a failed entry coming back on the next run,
+# and HTTP errors reported without storing validators.
+import argparse
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from feed_fetcher import FeedFetcher
+
+
+def serve(directory):
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append((self.path, self.headers.get("If-None-Match")))
+            path = os.path.join(directory, os.path.basename(self.path))
+            if self.path == "/broken.xml" or not os.path.isfile(path):
+                # Error pages with an ETag, as some hosts send them
+                self.send_response(500 if self.path == "/broken.xml" else 404)
+                self.send_header("ETag", '"error-page"')
+                self.end_headers()
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests_seen
+
+
+def guids(results):
+    return sorted(e["guid"] for r in results for e in r["entries"])
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixtures", default=os.path.join(here, "fixtures", "feeds"))
+    args = ap.parse_args()
+
+    server, seen = serve(args.fixtures)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/{name}" for name in sorted(os.listdir(args.fixtures)) if name.endswith(".xml")]
+    fetcher = FeedFetcher(path=":memory:")
+    report = {}
+
+    # 1. Every entry once, even when two feeds carry the same guid
+    first = fetcher.fetch(urls)
+    assert all(r["status"] == 200 and r["etag"] for r in first), first
+    report["first_fetch"] = guids(first)
+    assert len(report["first_fetch"]) == len(set(report["first_fetch"])), "duplicate guid across feeds"
+
+    # 2. One entry fails ingestion: its feed keeps no validators and the entry returns
+    failed = report["first_fetch"][0]
+    fetcher.commit(first, ingested=set(report["first_fetch"]) - {failed})
+    second = fetcher.fetch(urls)
+    report["after_partial_commit"] = {r["url"].rsplit("/", 1)[1]: r["status"] for r in second}
+    assert guids(second) == [failed], guids(second)
+
+    # 3. Everything ingested: conditional GETs come back 304 with no entries
+    fetcher.commit(second)
+    third = fetcher.fetch(urls)
+    report["conditional_get"] = {r["url"].rsplit("/", 1)[1]: r["status"] for r in third}
+    assert all(r["not_modified"] and not r["entries"] for r in third), third
+    assert all(inm for path, inm in seen[-len(urls):]), "If-None-Match not sent"
+
+    # 4. Failing hosts are reported as errors, not raised, and leave no validators
+    errors = fetcher.fetch([f"{base}/broken.xml", f"{base}/missing.xml"])
+    fetcher.commit(errors)
+    report["errors"] = {r["url"].rsplit("/", 1)[1]: r.get("error") for r in errors}
+    assert [r.get("error") for r in errors] == ["HTTP 500", "HTTP 404"], errors
+    assert all(not r["entries"] for r in errors)
+    assert fetcher._validators(f"{base}/missing.xml") == {"etag": None, "modified": None}
+
+    server.shutdown()
+    print(json.dumps({"ok": True, "feeds": len(urls), **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# Content-addressed cache for Gemini incident extractions.
+# Two layers: an in-process LRU in front of a local SQLite file, both keyed by
+# sha256(model, prompt version, normalized text).
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").split()).lower()
+
+
+class ExtractCache:
+    """
+    get/put extracted incident dicts by input text. Entries expire after
+    ttl_seconds; the SQLite store is trimmed to max_rows oldest-first.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        model_name: str = "",
+        prompt_version: str = "v1",
+        ttl_seconds: float = 7 * 24 * 3600,
+        memory_items: int = 1024,
+        max_rows: int = 100_000,
+    ):
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self.ttl_seconds = ttl_seconds
+        self.memory_items = memory_items
+        self.max_rows = max_rows
+
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS extractions_created ON extractions(created_at)")
+        self._conn.commit()
+        self._writes = 0
+
+        # counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- public ----------
+
+    def key(self, text: str) -> str:
+        raw = "\x1f".join([self.model_name, self.prompt_version, normalize_text(text)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        k = self.key(text)
+        now = time.time()
+        with self._lock:
+            hit = self._lru.get(k)
+            if hit is not None and now - hit[1] < self.ttl_seconds:
+                self._lru.move_to_end(k)
+                self.memory_hits += 1
+                return json.loads(hit[0])
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM extractions WHERE key = ?", (k,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl_seconds:
+                self._lru.pop(k, None)
+                self.misses += 1
+                return None
+            self._remember(k, row[0], row[1])
+            self.disk_hits += 1
+            return json.loads(row[0])
+
+    def put(self, text: str, value: Dict[str, Any]) -> None:
+        k = self.key(text)
+        raw = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(k, raw, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, created_at) VALUES (?, ?, ?)",
+                (k, raw, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            rows = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_items": len(self._lru),
+                "disk_rows": rows,
+                "evictions": self.evictions,
+            }
+
+    # ---------- helpers ----------
+
+    def _remember(self, k: str, raw: str, created_at: float) -> None:
+        self._lru[k] = (raw, created_at)
+        self._lru.move_to_end(k)
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        cur = self._conn.execute("DELETE FROM extractions WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.evictions += cur.rowcount
+        rows = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        if rows > self.max_rows:
+            cur = self._conn.execute(
+                "DELETE FROM extractions WHERE key IN ("
+                " SELECT key FROM extractions ORDER BY created_at LIMIT ?)",
+                (rows - self.max_rows,),
+            )
+            self.evictions += cur.rowcount
@@ -0,0 +1,154 @@
+# Concurrent RSS fetching with conditional GETs and entry-level dedup.
+# Validators (ETag / Last-Modified) and seen entry ids live in a local SQLite
+# file and are only committed for the entries the caller actually ingested.
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+import hashlib
+import sqlite3
+import threading
+import time
+
+import feedparser
+
+
+def entry_guid(entry: Dict[str, Any]) -> str:
+    guid = entry.get("id") or entry.get("guid") or entry.get("link")
+    if guid:
+        return str(guid)
+    raw = f"{entry.get('title', '')}\x1f{entry.get('summary', '')}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def feed_incident_id(guid: str) -> str:
+    """Deterministic incident document id for a feed entry (guids are often URLs)."""
+    return "feed_" + hashlib.sha256(guid.encode("utf-8")).hexdigest()[:32]
+
+
+class FeedFetcher:
+    """
+    fetch(urls) -> per-feed results with only unseen entries;
+    commit(results, ingested) -> mark the ingested entries seen and persist
+    validators of feeds whose entries all made it.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        seen_ttl_seconds: float = 14 * 24 * 3600,
+        max_workers: int = 8,
+        entries_per_feed: int = 10,
+    ):
+        self.seen_ttl_seconds = seen_ttl_seconds
+        self.max_workers = max_workers
+        self.entries_per_feed = entries_per_feed
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feed_validators ("
+            " url TEXT PRIMARY KEY, etag TEXT, modified TEXT, fetched_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feed_seen ("
+            " guid TEXT PRIMARY KEY, url TEXT, seen_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    # ---------- public ----------
+
+    def fetch(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch all feeds concurrently. Each result:
+        {url, status, not_modified, etag, modified, entries: [{guid, text}], error?}
+        """
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(urls)))) as pool:
+            results = list(pool.map(self._fetch_one, urls))
+
+        # Entries already ingested (or repeated across feeds) are dropped here
+        seen = self._seen_guids([e["guid"] for r in results for e in r["entries"]])
+        for r in results:
+            fresh = []
+            for e in r["entries"]:
+                if e["guid"] not in seen:
+                    seen.add(e["guid"])
+                    fresh.append(e)
+            r["entries"] = fresh
+        return results
+
+    def commit(self, results: List[Dict[str, Any]], ingested: Optional[Set[str]] = None) -> None:
+        """
+        `ingested` holds the guids that were ingested (None = all of them). A
+        feed with a failed entry keeps its old validators, so the next fetch
+        is a full GET and the failed entry comes back.
+        """
+        now = time.time()
+        with self._lock:
+            for r in results:
+                if r.get("error"):
+                    continue
+                done = [e for e in r["entries"] if ingested is None or e["guid"] in ingested]
+                if not r["not_modified"] and len(done) == len(r["entries"]):
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO feed_validators (url, etag, modified, fetched_at) VALUES (?, ?, ?, ?)",
+                        (r["url"], r.get("etag"), r.get("modified"), now),
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO feed_seen (guid, url, seen_at) VALUES (?, ?, ?)",
+                    [(e["guid"], r["url"], now) for e in done],
+                )
+            self._conn.execute("DELETE FROM feed_seen WHERE seen_at < ?", (now - self.seen_ttl_seconds,))
+            self._conn.commit()
+
+    # ---------- helpers ----------
+
+    def _validators(self, url: str) -> Dict[str, Optional[str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, modified FROM feed_validators WHERE url = ?", (url,)
+            ).fetchone()
+        return {"etag": row[0], "modified": row[1]} if row else {"etag": None, "modified": None}
+
+    def _seen_guids(self, guids: List[str]) -> set:
+        cutoff = time.time() - self.seen_ttl_seconds
+        seen = set()
+        with self._lock:
+            for start in range(0, len(guids), 500):
+                chunk = guids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT guid FROM feed_seen WHERE seen_at >= ? AND guid IN ({marks})",
+                    [cutoff, *chunk],
+                ).fetchall()
+                seen.update(r[0] for r in rows)
+        return seen
+
+    def _fetch_one(self, url: str) -> Dict[str, Any]:
+        v = self._validators(url)
+        result = {"url": url, "status": None, "not_modified": False, "etag": None, "modified": None, "entries": []}
+        try:
+            feed = feedparser.parse(url, etag=v["etag"], modified=v["modified"])
+        except Exception as e:
+            result["error"] = str(e)
+            return result
+
+        result["status"] = getattr(feed, "status", None)
+        if result["status"] == 304:
+            result["not_modified"] = True
+            return result
+        if result["status"] is None and feed.get("bozo"):
+            result["error"] = str(feed.get("bozo_exception", "fetch failed"))
+            return result
+        if result["status"] and result["status"] >= 400:
+            # Error pages must not leave validators or pass for an empty feed
+            result["error"] = f"HTTP {result['status']}"
+            return result
+
+        result["etag"] = feed.get("etag")
+        result["modified"] = feed.get("modified")
+        for e in feed.entries[: self.entries_per_feed]:
+            text = f"{e.get('title', '')} {e.get('summary', '')}".strip()
+            if text:
+                result["entries"].append({"guid": entry_guid(e), "text": text})
+        return result
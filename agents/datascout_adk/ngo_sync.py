@@ -0,0 +1,72 @@
+# Diffing bulk sync for the Firestore 'ngos' collection.
+# Each record is fingerprinted; only new or changed documents are written, in
+# WriteBatch commits, and documents of the same source that disappeared
+# upstream can be removed.
+from typing import Any, Dict, Iterable, Tuple
+import hashlib
+import json
+
+# Firestore caps a WriteBatch at 500 operations
+BATCH_MAX = 500
+
+
+def fingerprint(record: Dict[str, Any]) -> str:
+    raw = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def sync_ngos(
+    db,
+    records: Iterable[Tuple[str, Dict[str, Any]]],
+    source: str,
+    remove_missing: bool = True,
+    collection: str = "ngos",
+) -> Dict[str, int]:
+    """
+    records: (doc_id, data) pairs, all from `source`. Data is stored with
+    'source' and 'fingerprint' fields added.
+    Returns {added, updated, unchanged, removed, commits}.
+    """
+    col = db.collection(collection)
+    # One projected read of what this source already has
+    existing = {
+        d.id: (d.to_dict() or {}).get("fingerprint")
+        for d in col.where("source", "==", source).select(["fingerprint"]).stream()
+    }
+
+    counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "commits": 0}
+    batch, pending = db.batch(), 0
+    seen = set()
+
+    def flush():
+        nonlocal batch, pending
+        if pending:
+            batch.commit()
+            counts["commits"] += 1
+        batch, pending = db.batch(), 0
+
+    for doc_id, data in records:
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        doc = {**data, "source": source}
+        fp = fingerprint(doc)
+        if existing.get(doc_id) == fp:
+            counts["unchanged"] += 1
+            continue
+
+        counts["updated" if doc_id in existing else "added"] += 1
+        batch.set(col.document(doc_id), {**doc, "fingerprint": fp})
+        pending += 1
+        if pending >= BATCH_MAX:
+            flush()
+
+    if remove_missing:
+        for doc_id in existing.keys() - seen:
+            batch.delete(col.document(doc_id))
+            pending += 1
+            counts["removed"] += 1
+            if pending >= BATCH_MAX:
+                flush()
+    flush()
+    return counts
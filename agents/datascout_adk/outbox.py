@@ -0,0 +1,306 @@
+# Durable outbox between DataScout and ResourcePlanner.
+# Incidents are enqueued when created; OutboxConsumer drains them into the
+# planner with bounded concurrency, exponential backoff and a dead-letter state.
+# Backends: SqliteOutbox (local file, also the test stand-in) and FirestoreOutbox.
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Union
+import json
+import random
+import sqlite3
+import threading
+import time
+
+from google.cloud import firestore
+
+PENDING, INFLIGHT, DEAD = "pending", "inflight", "dead"
+
+
+class SqliteOutbox:
+    """
+    Outbox rows in a local SQLite file. Claimed rows are leased: if a consumer
+    dies mid-delivery the row becomes claimable again when the lease expires.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL,"
+            " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox(status, next_attempt_at)")
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (payload, status, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (json.dumps(payload, default=str), PENDING, now, now),
+            )
+        return str(cur.lastrowid)
+
+    def claim(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, payload, attempts FROM outbox"
+                    " WHERE status IN (?, ?) AND next_attempt_at <= ?"
+                    " ORDER BY next_attempt_at LIMIT ?",
+                    (PENDING, INFLIGHT, now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET status = ?, next_attempt_at = ? WHERE id = ?",
+                    [(INFLIGHT, now + lease_seconds, r[0]) for r in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [{"id": str(r[0]), "payload": json.loads(r[1]), "attempts": r[2]} for r in rows]
+
+    def ack(self, item_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (int(item_id),))
+
+    def retry(self, item_id: str, attempts: int, next_attempt_at: float, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (PENDING, attempts, next_attempt_at, error, int(item_id)),
+            )
+
+    def dead(self, item_id: str, attempts: int, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = ? WHERE id = ?",
+                (DEAD, attempts, error, int(item_id)),
+            )
+
+    def depth(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        out = {PENDING: 0, INFLIGHT: 0, DEAD: 0}
+        out.update({status: n for status, n in rows})
+        return out
+
+
+class FirestoreOutbox:
+    """
+    Outbox documents in a Firestore collection; claims use a transaction per
+    document so concurrent consumers never lease the same item.
+    """
+
+    def __init__(self, db, collection: str = "outbox"):
+        self.db = db
+        self.col = db.collection(collection)
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        _, ref = self.col.add({
+            "payload": payload,
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": time.time(),
+            "created_at": firestore.SERVER_TIMESTAMP,
+        })
+        return ref.id
+
+    def claim(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        now = time.time()
+        due = (
+            self.col.where("status", "in", [PENDING, INFLIGHT])
+            .where("next_attempt_at", "<=", now)
+            .order_by("next_attempt_at")
+            .limit(limit)
+            .stream()
+        )
+
+        @firestore.transactional
+        def lease(txn, ref):
+            snap = ref.get(transaction=txn)
+            data = snap.to_dict() or {}
+            if not snap.exists or data.get("status") == DEAD or data.get("next_attempt_at", 0) > now:
+                return None
+            txn.update(ref, {"status": INFLIGHT, "next_attempt_at": now + lease_seconds})
+            return data
+
+        claimed = []
+        for d in due:
+            try:
+                data = lease(self.db.transaction(), d.reference)
+            except Exception:
+                continue
+            if data is not None:
+                claimed.append({"id": d.id, "payload": data.get("payload") or {}, "attempts": data.get("attempts", 0)})
+        return claimed
+
+    def ack(self, item_id: str) -> None:
+        self.col.document(item_id).delete()
+
+    def retry(self, item_id: str, attempts: int, next_attempt_at: float, error: str) -> None:
+        self.col.document(item_id).update({
+            "status": PENDING, "attempts": attempts, "next_attempt_at": next_attempt_at, "last_error": error,
+        })
+
+    def dead(self, item_id: str, attempts: int, error: str) -> None:
+        self.col.document(item_id).update({"status": DEAD, "attempts": attempts, "last_error": error})
+
+    def depth(self) -> Dict[str, int]:
+        out = {}
+        for status in (PENDING, INFLIGHT, DEAD):
+            res = self.col.where("status", "==", status).count().get()
+            out[status] = int(res[0][0].value)
+        return out
+
+
+class OutboxConsumer:
+    """
+    Drains an outbox into `deliver(payload) -> bool | Future[bool]`.
+    At most `concurrency` deliveries are in flight; failures back off
+    exponentially (with jitter) and go dead after max_attempts.
+    """
+
+    def __init__(
+        self,
+        backend,
+        deliver: Callable[[Dict[str, Any]], Union[bool, Future]],
+        concurrency: int = 8,
+        claim_size: int = 50,
+        lease_seconds: float = 60.0,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        max_attempts: int = 8,
+        poll_interval: float = 1.0,
+    ):
+        self.backend = backend
+        self.deliver = deliver
+        self.concurrency = max(1, concurrency)
+        self.claim_size = max(1, claim_size)
+        self.lease_seconds = lease_seconds
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # counters
+        self.delivered = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+    # ---------- public ----------
+
+    def drain(self, max_items: Optional[int] = None) -> Dict[str, int]:
+        """Deliver due items until the queue has nothing due or max_items is reached."""
+        done = {"delivered": 0, "retried": 0, "dead": 0}
+        handled = 0
+        while max_items is None or handled < max_items:
+            size = self.claim_size if max_items is None else min(self.claim_size, max_items - handled)
+            items = self.backend.claim(size, self.lease_seconds)
+            if not items:
+                break
+            handled += len(items)
+            for outcome in self._deliver_all(items):
+                done[outcome] += 1
+        return done
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-consumer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {"delivered": self.delivered, "retried": self.retried, "dead_lettered": self.dead_lettered}
+        return {"depth": self.backend.depth(), "running": self._thread is not None, **counters}
+
+    # ---------- helpers ----------
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                res = self.drain(max_items=self.claim_size)
+            except Exception:
+                res = {}
+            if not any(res.values()):
+                self._stop.wait(self.poll_interval)
+
+    def _deliver_all(self, items: List[Dict[str, Any]]) -> List[str]:
+        slots = threading.BoundedSemaphore(self.concurrency)
+        outcomes: List[str] = []
+        waiting: List[Future] = []
+
+        for item in items:
+            slots.acquire()
+            fut = self._start(item["payload"])
+            settled: Future = Future()
+
+            def on_done(f, item=item, settled=settled):
+                try:
+                    err = None if f.result() else "planner rejected dispatch"
+                except Exception as e:
+                    err = str(e) or type(e).__name__
+                try:
+                    settled.set_result(self._settle(item, err))
+                except Exception as e:
+                    settled.set_exception(e)
+                finally:
+                    slots.release()
+
+            fut.add_done_callback(on_done)
+            waiting.append(settled)
+
+        for settled in waiting:
+            try:
+                outcomes.append(settled.result())
+            except Exception:
+                # Backend write failed; the lease expires and the item is retried
+                pass
+        return outcomes
+
+    def _start(self, payload: Dict[str, Any]) -> Future:
+        try:
+            res = self.deliver(payload)
+        except Exception as e:
+            fut: Future = Future()
+            fut.set_exception(e)
+            return fut
+        if isinstance(res, Future):
+            return res
+        fut = Future()
+        fut.set_result(bool(res))
+        return fut
+
+    def _settle(self, item: Dict[str, Any], err: Optional[str]) -> str:
+        if err is None:
+            self.backend.ack(item["id"])
+            with self._lock:
+                self.delivered += 1
+            return "delivered"
+
+        attempts = int(item.get("attempts", 0)) + 1
+        if attempts >= self.max_attempts:
+            self.backend.dead(item["id"], attempts, err)
+            with self._lock:
+                self.dead_lettered += 1
+            return "dead"
+
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        self.backend.retry(item["id"], attempts, time.time() + delay * random.uniform(0.5, 1.0), err)
+        with self._lock:
+            self.retried += 1
+        return "retried"
@@ -0,0 +1,78 @@
+# Small threaded stage pipeline: each stage has its own worker pool and a
+# bounded input queue, so a slow stage applies backpressure upstream instead
+# of letting work pile up in memory.
+from typing import Any, Callable, Iterable, List, NamedTuple, Tuple
+import queue
+import threading
+
+_DONE = object()
+
+
+class Stage(NamedTuple):
+    name: str
+    fn: Callable[[Any], Iterable[Any]]  # one input -> zero or more outputs
+    workers: int = 1
+
+
+def run_pipeline(items: Iterable[Any], stages: List[Stage], queue_size: int = 32) -> Tuple[List[Any], List[Tuple[str, str]]]:
+    """
+    Push items through stages concurrently.
+    Returns (outputs of the last stage, [(stage name, error), ...]).
+    A failing item is recorded and dropped; the rest keep flowing.
+    """
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages] + [queue.Queue(maxsize=max(1, queue_size))]
+    errors: List[Tuple[str, str]] = []
+    errors_lock = threading.Lock()
+    threads: List[threading.Thread] = []
+
+    for idx, stage in enumerate(stages):
+        inq, outq = queues[idx], queues[idx + 1]
+        workers = max(1, stage.workers)
+        # Each worker of the next stage needs its own sentinel; the collector needs one
+        downstream = max(1, stages[idx + 1].workers) if idx + 1 < len(stages) else 1
+        state = {"alive": workers}
+        state_lock = threading.Lock()
+
+        def work(stage=stage, inq=inq, outq=outq, state=state, state_lock=state_lock, downstream=downstream):
+            while True:
+                item = inq.get()
+                if item is _DONE:
+                    break
+                try:
+                    for out in stage.fn(item) or ():
+                        outq.put(out)
+                except Exception as e:
+                    with errors_lock:
+                        errors.append((stage.name, str(e)))
+            with state_lock:
+                state["alive"] -= 1
+                last = state["alive"] == 0
+            if last:
+                for _ in range(downstream):
+                    outq.put(_DONE)
+
+        for n in range(workers):
+            t = threading.Thread(target=work, name=f"{stage.name}-{n}", daemon=True)
+            t.start()
+            threads.append(t)
+
+    def feed():
+        for item in items:
+            queues[0].put(item)
+        for _ in range(max(1, stages[0].workers)):
+            queues[0].put(_DONE)
+
+    feeder = threading.Thread(target=feed, name="pipeline-feed", daemon=True)
+    feeder.start()
+
+    outputs: List[Any] = []
+    while True:
+        out = queues[-1].get()
+        if out is _DONE:
+            break
+        outputs.append(out)
+
+    feeder.join()
+    for t in threads:
+        t.join()
+    return outputs, errors
@@ -0,0 +1,135 @@
+# Pooled, batching HTTP dispatcher for the ResourcePlanner agent.
+# Incidents are queued and sent to plan_matches_batch over one keep-alive
+# session, either when batch_size is reached or flush_interval has passed.
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def planner_base_url(url: str) -> str:
+    """Strip a configured /actions/<name> or /invoke/<name> suffix."""
+    url = url.rstrip("/")
+    for prefix in ("/actions/", "/invoke/"):
+        idx = url.rfind(prefix)
+        if idx != -1:
+            return url[:idx]
+    return url
+
+
+class PlannerDispatcher:
+    """
+    submit(incident, incident_id) -> Future[bool], resolved with the planner's
+    per-incident result once its batch has been sent.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        batch_size: int = 20,
+        flush_interval: float = 0.25,
+        timeout: float = 30.0,
+        pool_size: int = 4,
+    ):
+        self.url = f"{planner_base_url(base_url)}/actions/plan_matches_batch"
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._senders = ThreadPoolExecutor(max_workers=max(1, pool_size), thread_name_prefix="planner-send")
+
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[Dict[str, Any], Future]] = []
+        self._first_at: Optional[float] = None
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run, name="planner-flush", daemon=True)
+        self._flusher.start()
+
+        # counters
+        self.batches_sent = 0
+        self.items_sent = 0
+        self.items_failed = 0
+
+    # ---------- public ----------
+
+    def submit(self, incident: Dict[str, Any], incident_id: Optional[str] = None) -> Future:
+        fut: Future = Future()
+        with self._cond:
+            if self._closed:
+                fut.set_result(False)
+                return fut
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append(({"incident": incident, "incident_id": incident_id}, fut))
+            # Wake the flusher to start the linger timer (first item) or send (full batch)
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return fut
+
+    def flush(self) -> None:
+        with self._cond:
+            batch = self._take()
+        if batch:
+            self._send(batch)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join(timeout=self.timeout)
+        self.flush()
+        self._senders.shutdown(wait=True)
+        self.session.close()
+
+    # ---------- helpers ----------
+
+    def _take(self) -> List[Tuple[Dict[str, Any], Future]]:
+        batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size:]
+        self._first_at = time.monotonic() if self._pending else None
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                    if self._first_at is not None:
+                        wait = self.flush_interval - (time.monotonic() - self._first_at)
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+                batch = self._take()
+            if batch:
+                self._senders.submit(self._send, batch)
+
+    def _send(self, batch: List[Tuple[Dict[str, Any], Future]]) -> None:
+        results: List[Any] = []
+        try:
+            r = self.session.post(self.url, json={"items": [req for req, _ in batch]}, timeout=self.timeout)
+            if r.status_code // 100 == 2:
+                results = ((r.json() or {}).get("result") or {}).get("results") or []
+        except Exception:
+            results = []
+
+        ok_count = 0
+        for i, (_, fut) in enumerate(batch):
+            res = results[i] if i < len(results) else None
+            ok = isinstance(res, dict) and "error" not in res
+            ok_count += ok
+            fut.set_result(ok)
+        with self._cond:
+            self.batches_sent += 1
+            self.items_sent += ok_count
+            self.items_failed += len(batch) - ok_count
@@ -4,6 +4,7 @@ Run this once locally (with gcloud auth application-default login) or from a Clo
 """
 
 from google.cloud import firestore
+from ngo_sync import sync_ngos
 import os
 
 def seed_verified_ngos():
@@ -41,16 +42,17 @@ def seed_verified_ngos():
     ]
 
     db = firestore.Client(database=os.getenv("GOOGLE_CLOUD_FIRESTORE_DB"))
-    count = 0
-    for ngo in ngos:
-        doc_id = f"{ngo['name'].lower().replace(' ', '_')}_{ngo['country'].lower()}"
-        db.collection("ngos").document(doc_id).set({
-            **ngo,
-            "source": "verified_manual_seed",
-        })
-        count += 1
+    records = [
+        (f"{ngo['name'].lower().replace(' ', '_')}_{ngo['country'].lower()}", ngo)
+        for ngo in ngos
+    ]
+    counts = sync_ngos(db, records, source="verified_manual_seed")
 
-    print(f"✅ Seeded {count} verified NGOs into Firestore 'ngos' collection.")
+    print(
+        f"✅ Seeded {len(records)} verified NGOs into Firestore 'ngos' collection "
+        f"(added {counts['added']}, updated {counts['updated']}, "
+        f"unchanged {counts['unchanged']}, removed {counts['removed']})."
+    )
 
 
 if __name__ == "__main__":
@@ -1,18 +1,34 @@
 from typing import Dict, Any, List, Optional
 import os
+from google.api_core.exceptions import AlreadyExists
 from google.cloud import firestore
 from adk import Agent, action
+from ngo_index import NgoIndex
+
+# Firestore caps a WriteBatch at 500 operations
+SWEEP_BATCH_MAX = 500
+
+# NGOs kept per resolved service, nearest first when the incident can be placed
+MATCH_K = int(os.getenv("NGO_MATCH_K", "5"))
 
 
 class ResourcePlannerAgent(Agent):
     """
-    Matches incidents' needs to NGOs by service in Firestore.
+    Matches incidents' needs to NGOs by service in Firestore, ranked by
+    distance from the incident.
     """
 
     def __init__(self):
         super().__init__(name="resourceplanner-adk")
         self.db = firestore.Client(database=os.getenv("GOOGLE_CLOUD_FIRESTORE_DB"))
 
+        # Process-local NGO directory; replaces one Firestore query per need
+        self.ngo_index = NgoIndex(
+            self.db,
+            ttl_seconds=float(os.getenv("NGO_INDEX_TTL_SECONDS", "300")),
+            live=os.getenv("NGO_INDEX_LIVE", "1") == "1",
+        )
+
     # ---------- capabilities ----------
 
     @action()
@@ -21,85 +37,229 @@ class ResourcePlannerAgent(Agent):
         Given a single incident JSON, find matching NGOs and persist a match document.
         Input: { incident: {...}, incident_id?: "abc123" }
         """
-        needs = incident.get("needs", []) or []
-        if not isinstance(needs, list):
-            needs = [str(needs)]
+        match_doc, need_count, match_count = self._build_match_doc(incident, incident_id)
 
-        matches: List[Dict[str, Any]] = []
-        for need in needs:
-            matches.extend(
-                self._find_ngos_for_need(
-                    str(need).strip().lower(),
-                    incident.get("country")
-                )
-            )
-
-        if matches:
-            match_doc = {
-                "incident_id": incident_id,
-                "incident": incident,
-                "matches": matches,
-                "created_at": firestore.SERVER_TIMESTAMP,
-            }
+        if match_doc:
             # Use incident_id if provided for idempotency
             if incident_id:
-                self.db.collection("matches").document(incident_id).set(match_doc)
+                self._commit_matches([(self.db.collection("matches").document(incident_id), match_doc)])
             else:
                 self.db.collection("matches").add(match_doc)
 
-        return {"need_count": len(needs), "match_count": len(matches)}
+        return {"need_count": need_count, "match_count": match_count}
 
     @action()
-    def plan_unmatched_incidents(self, limit: int = 50) -> Dict[str, Any]:
+    def plan_matches_batch(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Batch form of plan_matches: resolve every incident against the NGO index
+        and commit all match documents in WriteBatch chunks.
+        Input: { items: [{ incident: {...}, incident_id?: "abc123" }, ...] }
+        Output: { results: [{incident_id, need_count, match_count} | {incident_id, error}] }
+        """
+        matches = self.db.collection("matches")
+        results: List[Dict[str, Any]] = []
+        writes = []
+        resolved = self._resolve_needs(
+            (item or {}).get("incident") for item in items if isinstance((item or {}).get("incident"), dict)
+        )
+        for item in items:
+            incident_id = (item or {}).get("incident_id")
+            incident = (item or {}).get("incident")
+            if not isinstance(incident, dict):
+                results.append({"incident_id": incident_id, "error": "missing incident"})
+                continue
+
+            match_doc, need_count, match_count = self._build_match_doc(incident, incident_id, resolved)
+            if match_doc:
+                writes.append((matches.document(incident_id) if incident_id else matches.document(), match_doc))
+            results.append({"incident_id": incident_id, "need_count": need_count, "match_count": match_count})
+
+        self._commit_matches(writes)
+        return {"results": results}
+
+    @action()
+    def plan_unmatched_incidents(
+        self,
+        limit: Optional[int] = 50,
+        page_size: int = 100,
+        start_after: Optional[str] = None,
+    ) -> Dict[str, Any]:
         """
         Sweep mode: look at recent incidents and create matches for those
         that don't have a corresponding entry in 'matches'.
+
+        Incidents are paged newest-first with a cursor. Each page costs one
+        get_all() for match existence and one batched commit for the new matches.
+        Input: { limit?: 50 (null = everything), page_size?: 100, start_after?: "<incident_id>" }
         """
-        incs = list(self.db.collection("incidents").order_by("created_at", direction=firestore.Query.DESCENDING).limit(limit).stream())
-        processed, matched = 0, 0
-        for inc in incs:
-            incident_id = inc.id
-            is_matched = self.db.collection("matches").document(incident_id).get().exists
-            if is_matched:
-                continue
+        incidents = self.db.collection("incidents")
+        matches = self.db.collection("matches")
+        page_size = max(1, min(int(page_size), SWEEP_BATCH_MAX))
+
+        cursor = incidents.document(start_after).get() if start_after else None
+        if cursor is not None and not cursor.exists:
+            return {"error": f"Unknown start_after incident '{start_after}'"}
+
+        scanned, processed, matched, pages = 0, 0, 0, 0
+        while limit is None or scanned < limit:
+            size = page_size if limit is None else min(page_size, limit - scanned)
+            q = incidents.order_by("created_at", direction=firestore.Query.DESCENDING)
+            if cursor is not None:
+                q = q.start_after(cursor)
+            page = list(q.limit(size).stream())
+            if not page:
+                cursor = None
+                break
+            pages += 1
+            scanned += len(page)
+            cursor = page[-1]
+
+            # One round trip for the whole page's existence checks
+            existing = {
+                snap.id
+                for snap in self.db.get_all([matches.document(inc.id) for inc in page])
+                if snap.exists
+            }
+
+            todo = [(inc.id, inc.to_dict() or {}) for inc in page if inc.id not in existing]
+            resolved = self._resolve_needs(data for _, data in todo)
+
+            writes = []
+            for inc_id, data in todo:
+                match_doc, _, match_count = self._build_match_doc(data, inc_id, resolved)
+                processed += 1
+                if match_doc:
+                    writes.append((matches.document(inc_id), match_doc))
+                    matched += 1
+            self._commit_matches(writes, first_planned={})
 
-            data = inc.to_dict() or {}
-            res = self.plan_matches(incident=data, incident_id=incident_id)
-            processed += 1
-            if res.get("match_count", 0) > 0:
-                matched += 1
+            if len(page) < size:
+                cursor = None
+                break
 
-        return {"processed": processed, "newly_matched_incidents": matched}
+        return {
+            "processed": processed,
+            "newly_matched_incidents": matched,
+            "scanned": scanned,
+            "pages": pages,
+            "next_cursor": cursor.id if cursor is not None else None,
+        }
+
+    @action()
+    def index_stats(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Hit rate, size and age of the in-memory NGO index.
+        Input: { refresh?: true } forces a reload on the next lookup.
+        """
+        if refresh:
+            self.ngo_index.invalidate()
+        return self.ngo_index.stats()
 
     # ---------- helpers ----------
 
-    def _find_ngos_for_need(self, need: str, country: Optional[str] = None) -> List[Dict[str, Any]]:
+    def _find_ngos_for_need(self, need: str, country: Optional[str] = None, place=None) -> List[Dict[str, Any]]:
         """
-        Finds NGOs that offer a given service (need).
+        Finds up to MATCH_K NGOs that offer a given service (need) from the in-memory index.
         Preference order:
-          1. Same country
-          2. Global fallback if none found
+          1. Nearest to `place` (geocoded incident location), with distance_km
+          2. Same country
+          3. Global fallback if none found
         """
-        need = (need or "").strip().lower()
-        if not need:
-            return []
-
-        q = self.db.collection("ngos").where("service", "==", need).stream()
-        all_ngos = [d.to_dict() for d in q]
-        if not all_ngos:
-            return []
-
-        if country:
-            country = country.strip().lower()
-            same_country = [
-                n for n in all_ngos if n.get("country", "").lower() == country
-            ]
-            if same_country:
-                return same_country
-
-        # fallback: return all NGOs for this service
-        return all_ngos
+        if place is not None:
+            nearest = self.ngo_index.nearest(need, place, MATCH_K)
+            if nearest:
+                return [{**ngo, "distance_km": round(km, 1)} for ngo, km in nearest]
+        return self.ngo_index.lookup(need, country)[:MATCH_K]
+
+    @staticmethod
+    def _needs_of(incident: Dict[str, Any]) -> List[str]:
+        needs = incident.get("needs", []) or []
+        if not isinstance(needs, list):
+            needs = [str(needs)]
+        return [str(n).strip().lower() for n in needs]
+
+    def _resolve_needs(self, incidents) -> Dict[str, List[Any]]:
+        """need -> [(service, score), ...] for every distinct need, in one resolver pass."""
+        unique = list(dict.fromkeys(n for inc in incidents for n in self._needs_of(inc) if n))
+        return dict(zip(unique, self.ngo_index.resolve_needs(unique)))
+
+    def _commit_matches(self, writes, first_planned: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Commit (ref, match_doc) pairs in WriteBatch chunks. A match that already
+        exists keeps its created_at, i.e. its first plan: the ReportWriter reads
+        matches past a created_at watermark, so a re-planned incident is not
+        read (and counted) twice. `first_planned` maps ids to that time when the
+        caller already knows it ({}: all new); otherwise it is read here.
+        """
+        for start in range(0, len(writes), SWEEP_BATCH_MAX):
+            chunk = writes[start:start + SWEEP_BATCH_MAX]
+            known = first_planned
+            for attempt in range(3):
+                if known is None:
+                    known = {
+                        snap.id: (snap.to_dict() or {}).get("created_at")
+                        for snap in self.db.get_all([ref for ref, _ in chunk], field_paths=["created_at"])
+                        if snap.exists
+                    }
+                batch = self.db.batch()
+                for ref, doc in chunk:
+                    if ref.id not in known:
+                        batch.create(ref, doc)
+                        continue
+                    doc = {**doc, "updated_at": firestore.SERVER_TIMESTAMP}
+                    if known[ref.id] is not None:
+                        doc["created_at"] = known[ref.id]
+                    batch.set(ref, doc)
+                try:
+                    batch.commit()
+                    break
+                except AlreadyExists:
+                    # Planned concurrently since the read: re-read to keep that first plan
+                    if attempt == 2:
+                        raise
+                    known = None
+
+    def _build_match_doc(
+        self,
+        incident: Dict[str, Any],
+        incident_id: Optional[str] = None,
+        resolved: Optional[Dict[str, List[Any]]] = None,
+    ):
+        """
+        Resolve an incident's needs to directory services, then to NGOs, without
+        touching Firestore. `resolved` comes from _resolve_needs (computed here
+        when not given). Returns (match_doc or None, need_count, match_count).
+        """
+        needs = self._needs_of(incident)
+        if resolved is None:
+            resolved = self._resolve_needs([incident])
+        place = self.ngo_index.gazetteer.geocode(incident.get("location"), incident.get("country"))
+        country = incident.get("country") or (place.country if place else None)
+
+        matches: List[Dict[str, Any]] = []
+        services: Dict[str, List[str]] = {}
+        seen = set()
+        for need in needs:
+            for service, _score in resolved.get(need, []):
+                services.setdefault(need, []).append(service)
+                # Two needs resolving to one service should not list its NGOs twice
+                for ngo in self._find_ngos_for_need(service, country, place):
+                    key = (ngo.get("name"), service)
+                    if key not in seen:
+                        seen.add(key)
+                        matches.append(ngo)
 
+        if not matches:
+            return None, len(needs), 0
+        match_doc = {
+            "incident_id": incident_id,
+            "incident": incident,
+            "matches": matches,
+            "services": services,
+            "incident_place": place._asdict() if place else None,
+            "created_at": firestore.SERVER_TIMESTAMP,
+        }
+        return match_doc, len(needs), len(matches)
 
 
 root_agent = ResourcePlannerAgent()
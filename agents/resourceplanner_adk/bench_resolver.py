@@ -0,0 +1,81 @@
+# Recall and throughput of the need -> service resolver on the labeled
+# fixtures, against the previous exact-string match.
+#
+#   python bench_resolver.py [--fixtures fixtures/need_labels.json] [--batch 1000]
+#
+# Recall: share of labeled needs whose best resolved service is one of the
+# labels. Throughput: needs resolved per second, one call per batch.
+import argparse
+import json
+import os
+import random
+import time
+
+from service_resolver import ServiceResolver
+
+# Services produced by seed_ngos.py and the ReliefWeb import
+DIRECTORY_SERVICES = ["medical supplies", "food", "shelter", "general aid"]
+
+
+def recall(resolve, labeled):
+    hits = 0
+    misses = []
+    for item, got in zip(labeled, resolve([x["need"] for x in labeled])):
+        if got and got[0] in item["services"]:
+            hits += 1
+        else:
+            misses.append(item["need"])
+    return hits / len(labeled), misses
+
+
+def throughput(fn, needs, batch, seconds=1.0):
+    done, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for i in range(0, len(needs), batch):
+            fn(needs[i:i + batch])
+        done += len(needs)
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixtures", default=os.path.join(here, "fixtures", "need_labels.json"))
+    ap.add_argument("--batch", type=int, action="append", help="batch sizes (repeatable)")
+    args = ap.parse_args()
+
+    with open(args.fixtures) as f:
+        labeled = json.load(f)
+    services = set(DIRECTORY_SERVICES)
+
+    t = time.perf_counter()
+    resolver = ServiceResolver(DIRECTORY_SERVICES)
+    build_ms = (time.perf_counter() - t) * 1000
+
+    def exact(needs):
+        return [[n.strip().lower()] if n.strip().lower() in services else [] for n in needs]
+
+    def indexed(needs):
+        return [[s for s, _ in r] for r in resolver.resolve_many(needs)]
+
+    exact_recall, _ = recall(exact, labeled)
+    indexed_recall, misses = recall(indexed, labeled)
+
+    rng = random.Random(0)
+    workload = [rng.choice(labeled)["need"] for _ in range(20000)]
+    batches = args.batch or [1, 100, 1000, 10000]
+
+    print(json.dumps({
+        "fixtures": len(labeled),
+        "vocabulary": len(resolver.vocab),
+        "build_ms": round(build_ms, 2),
+        "recall": {"exact_match": round(exact_recall, 3), "resolver": round(indexed_recall, 3)},
+        "missed": misses,
+        "needs_per_second": {
+            f"batch_{b}": int(throughput(resolver.resolve_many, workload[: max(b, 2000)], b)) for b in batches
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
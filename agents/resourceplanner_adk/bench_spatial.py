@@ -0,0 +1,95 @@
+# Latency of k-nearest NGO queries on the spatial index, against a brute-force
+# scan of every NGO for the service (which the previous unranked list needed
+# anyway to be sorted by distance).
+#
+#   python bench_spatial.py [--ngos 1000 --ngos 100000] [--k 5]
+#
+# NGOs are synthetic: gazetteer places jittered by up to ~50 km, so they
+# cluster around cities the way the real directory does. Every tree answer
+# is checked against the brute-force distances.
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from gazetteer import Gazetteer
+from spatial import GeoKDTree, chord_to_km, unit_vectors
+
+INCIDENT_LOCATIONS = [
+    "Dhaka, Bangladesh", "Flooding near Boulder, CO", "Port-au-Prince", "Antakya, Hatay, Türkiye",
+    "Derna, Libya", "Cox's Bazar refugee camps", "Mekelle, Tigray", "Outskirts of São Paulo",
+    "Kyiv", "Tacloban City, Philippines", "Lahore", "Goma, DRC",
+]
+
+
+def synthetic(gazetteer, n, rng):
+    cities = [p for p in gazetteer.places if p.kind == "city"]
+    lat, lon = [], []
+    for _ in range(n):
+        c = rng.choice(cities)
+        lat.append(max(-90.0, min(90.0, c.lat + rng.uniform(-0.45, 0.45))))
+        lon.append(c.lon + rng.uniform(-0.45, 0.45))
+    return np.array(lat), np.array(lon)
+
+
+def timed(fn, queries, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for q in queries:
+            fn(q)
+        best = min(best, time.perf_counter() - t)
+    return best / len(queries) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ngos", type=int, action="append", help="directory sizes (repeatable)")
+    ap.add_argument("--k", type=int, default=5)
+    args = ap.parse_args()
+
+    gazetteer = Gazetteer.load()
+    t = time.perf_counter()
+    places = [gazetteer.geocode(text) for text in INCIDENT_LOCATIONS]
+    geocode_us = (time.perf_counter() - t) / len(INCIDENT_LOCATIONS) * 1e6
+    queries = [(p.lat, p.lon) for p in places if p is not None]
+
+    rows = []
+    rng = random.Random(0)
+    for n in args.ngos or [100, 1000, 10000, 100000]:
+        lat, lon = synthetic(gazetteer, n, rng)
+        t = time.perf_counter()
+        tree = GeoKDTree(lat, lon)
+        build_ms = (time.perf_counter() - t) * 1000
+        xyz = unit_vectors(lat, lon)
+
+        def brute(q):
+            d = np.sqrt(((xyz - unit_vectors([q[0]], [q[1]])[0]) ** 2).sum(axis=1))
+            top = np.argpartition(d, min(args.k, n) - 1)[: args.k]
+            return sorted(zip(chord_to_km(d[top]).tolist(), top.tolist()))
+
+        for q in queries:
+            got = [km for _, km in tree.nearest(q[0], q[1], args.k)]
+            want = [km for km, _ in brute(q)]
+            assert np.allclose(got, want, atol=1e-6), (q, got, want)
+
+        rows.append({
+            "ngos": n,
+            "build_ms": round(build_ms, 1),
+            "kd_tree_us": round(timed(lambda q: tree.nearest(q[0], q[1], args.k), queries), 1),
+            "brute_force_us": round(timed(brute, queries), 1),
+        })
+
+    print(json.dumps({
+        "gazetteer_places": len(gazetteer),
+        "geocoded": {text: p.name if p else None for text, p in zip(INCIDENT_LOCATIONS, places)},
+        "geocode_us": round(geocode_us, 1),
+        "k": args.k,
+        "nearest": rows,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
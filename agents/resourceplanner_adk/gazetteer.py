@@ -0,0 +1,88 @@
+# Offline place-name -> coordinates lookup.
+# data/gazetteer.csv lists cities and country centroids with their aliases;
+# free text such as "Flooding near Dhaka, Bangladesh" is geocoded by scanning
+# its word n-grams against that table, so no geocoding API is involved.
+import csv
+import os
+import re
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.csv")
+MAX_NGRAM = 4
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+class Place(NamedTuple):
+    name: str
+    country: str
+    lat: float
+    lon: float
+    kind: str  # "city" or "country"
+
+
+def normalize(text) -> str:
+    """Lowercase, strip accents and punctuation: 'São Paulo' -> 'sao paulo'."""
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode()
+    return _NON_WORD.sub(" ", text.lower().replace("'", "")).strip()
+
+
+class Gazetteer:
+    """
+    geocode(text, country=None) -> Place or None. A city beats a country
+    centroid; `country` (or a country named in the text) breaks ties between
+    cities of the same name and is the fallback when no city is found.
+    """
+
+    def __init__(self, places: List[Place], aliases: Optional[Dict[int, List[str]]] = None):
+        self.places = places
+        self._cities: Dict[str, List[Place]] = {}
+        self._countries: Dict[str, Place] = {}
+        for i, place in enumerate(places):
+            for key in [place.name] + (aliases or {}).get(i, []):
+                key = normalize(key)
+                if not key:
+                    continue
+                if place.kind == "country":
+                    self._countries.setdefault(key, place)
+                else:
+                    self._cities.setdefault(key, []).append(place)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> "Gazetteer":
+        places: List[Place] = []
+        aliases: Dict[int, List[str]] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                aliases[len(places)] = [a for a in (row.get("aliases") or "").split("|") if a]
+                places.append(Place(row["name"], row["country"], float(row["lat"]), float(row["lon"]), row["kind"]))
+        return cls(places, aliases)
+
+    def country(self, name) -> Optional[Place]:
+        return self._countries.get(normalize(name))
+
+    def geocode(self, text, country=None) -> Optional[Place]:
+        hint = self.country(country) if country else None
+        words = normalize(text).split()
+
+        cities: List[Place] = []
+        for n in range(min(MAX_NGRAM, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                key = " ".join(words[i:i + n])
+                cities.extend(self._cities.get(key, ()))
+                if hint is None and key in self._countries:
+                    hint = self._countries[key]
+            if cities:
+                break  # longest match wins: "new york" over "york"
+
+        if cities:
+            if hint is not None:
+                for city in cities:
+                    if city.country == hint.country:
+                        return city
+            return cities[0]
+        return hint
+
+    def __len__(self) -> int:
+        return len(self.places)
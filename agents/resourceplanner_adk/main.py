@@ -11,10 +11,12 @@ def root():
 def health():
     return {"ok": True, "agent": root_agent.name}
 
+@app.post("/actions/{action}")
 @app.post("/invoke/{action}")
 async def invoke(action: str, request: Request):
     """
     Simple endpoint to mimic ADK's /invoke/<action>.
+    Also served at /actions/<action>, the path DataScout dispatches to.
     """
     data = await request.json()
     if not hasattr(root_agent, action):
@@ -0,0 +1,247 @@
+# Process-local index of the Firestore 'ngos' collection.
+# Loaded once, kept current by a snapshot listener (or a TTL reload when
+# listeners are unavailable), and queried without any Firestore round trip.
+from typing import Dict, Any, List, Optional, Tuple
+import threading
+import time
+
+from gazetteer import Gazetteer, Place
+from service_resolver import SERVICE_SYNONYMS, ServiceResolver
+from spatial import GeoKDTree
+
+
+def _norm(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def _keywords(ngo: Dict[str, Any]) -> List[str]:
+    """Optional 'keywords' of an NGO document: a list or a ';'-separated string."""
+    raw = ngo.get("keywords") or []
+    if isinstance(raw, str):
+        raw = raw.split(";")
+    return [k for k in (_norm(k) for k in raw) if k]
+
+
+class NgoIndex:
+    """
+    In-memory view of 'ngos' keyed by normalized service and (service, country),
+    plus one spatial index per service over the NGOs the gazetteer can place.
+    """
+
+    def __init__(
+        self,
+        db,
+        collection: str = "ngos",
+        ttl_seconds: float = 300.0,
+        live: bool = True,
+        gazetteer: Optional[Gazetteer] = None,
+    ):
+        self.db = db
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.live = live
+        self.gazetteer = gazetteer or Gazetteer.load()
+
+        self._lock = threading.Lock()
+        # Serializes listener (re)starts; separate from _lock, which the
+        # snapshot callback needs while a starter waits for it
+        self._listener_lock = threading.Lock()
+        self._by_service: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_service_country: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._resolver = ServiceResolver([])
+        self._spatial: Dict[str, Tuple[GeoKDTree, List[Dict[str, Any]]]] = {}
+        self._located = 0
+        self._doc_count = 0
+        self._loaded_at: Optional[float] = None
+        self._watch = None
+
+        # counters
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.snapshot_updates = 0
+
+    # ---------- public ----------
+
+    def lookup(self, service: str, country: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        NGOs offering `service`, preferring those in `country`; falls back to all
+        NGOs for the service. Mirrors the old per-need Firestore query semantics.
+        """
+        service = _norm(service)
+        if not service:
+            return []
+        self._ensure_fresh()
+
+        with self._lock:
+            self.lookups += 1
+            if country:
+                same_country = self._by_service_country.get((service, _norm(country)))
+                if same_country:
+                    self.hits += 1
+                    return list(same_country)
+            all_ngos = self._by_service.get(service, [])
+            if all_ngos:
+                self.hits += 1
+            return list(all_ngos)
+
+    def nearest(self, service: str, place: Place, k: int = 5) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        The k NGOs offering `service` closest to `place`, as (ngo, km) nearest
+        first. NGOs the gazetteer could not place are not considered.
+        """
+        service = _norm(service)
+        if not service:
+            return []
+        self._ensure_fresh()
+
+        with self._lock:
+            self.lookups += 1
+            tree, ngos = self._spatial.get(service, (None, []))
+        if tree is None:
+            return []
+        found = [(ngos[i], km) for i, km in tree.nearest(place.lat, place.lon, k)]
+        if found:
+            with self._lock:
+                self.hits += 1
+        return found
+
+    def resolve_needs(self, needs: List[str]) -> List[List[Tuple[str, float]]]:
+        """
+        Canonical directory services for each free-text need, best first
+        (see ServiceResolver); one vectorized pass for the whole list.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            resolver = self._resolver
+        return resolver.resolve_many(needs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            age = None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 3)
+            return {
+                "docs": self._doc_count,
+                "services": len(self._by_service),
+                "vocabulary": len(self._resolver.vocab),
+                "located": self._located,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "misses": self.misses,
+                "loads": self.loads,
+                "snapshot_updates": self.snapshot_updates,
+                "age_seconds": age,
+                "live": self._watching(),
+            }
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def close(self) -> None:
+        with self._lock:
+            watch, self._watch = self._watch, None
+        if watch is not None:
+            try:
+                watch.unsubscribe()
+            except Exception:
+                pass
+
+    # ---------- helpers ----------
+
+    def _watching(self) -> bool:
+        """Caller holds _lock. A watch whose stream has died no longer counts."""
+        return self._watch is not None and getattr(self._watch, "is_active", True)
+
+    def _ensure_fresh(self) -> None:
+        with self._lock:
+            loaded_at = self._loaded_at
+            watching = self._watching()
+        if loaded_at is not None and (watching or time.monotonic() - loaded_at < self.ttl_seconds):
+            return
+
+        with self._lock:
+            self.misses += 1
+        if self.live:
+            with self._listener_lock:
+                with self._lock:
+                    if self._watching() and self._loaded_at is not None:
+                        return  # another caller started it meanwhile
+                    loads = self.loads
+                self._start_listener()
+                with self._lock:
+                    if self.loads > loads:
+                        return
+        self._rebuild(self.db.collection(self.collection).stream())
+
+    def _start_listener(self) -> None:
+        """
+        Subscribe to the collection, replacing a dead watch. The first callback
+        delivers the full snapshot, so wait briefly for it before falling back
+        to a plain read. Caller holds _listener_lock.
+        """
+        ready = threading.Event()
+
+        def on_snapshot(docs, changes, read_time):
+            try:
+                self._rebuild(docs, from_snapshot=True)
+            finally:
+                ready.set()
+
+        self.close()
+        try:
+            watch = self.db.collection(self.collection).on_snapshot(on_snapshot)
+        except Exception:
+            return
+        with self._lock:
+            self._watch = watch
+        ready.wait(timeout=10)
+
+    def _rebuild(self, docs, from_snapshot: bool = False) -> None:
+        by_service: Dict[str, List[Dict[str, Any]]] = {}
+        by_service_country: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        located: Dict[str, List[Tuple[Dict[str, Any], Place]]] = {}
+        keywords: Dict[str, set] = {}
+        count = 0
+        for d in docs:
+            ngo = d.to_dict() or {}
+            service = _norm(ngo.get("service"))
+            if not service:
+                continue
+            count += 1
+            by_service.setdefault(service, []).append(ngo)
+            keywords.setdefault(service, set()).update(_keywords(ngo))
+            country = _norm(ngo.get("country"))
+            if country:
+                by_service_country.setdefault((service, country), []).append(ngo)
+            place = self.gazetteer.geocode(ngo.get("location"), ngo.get("country"))
+            if place is not None:
+                located.setdefault(service, []).append((ngo, place))
+
+        spatial = {
+            service: (
+                GeoKDTree([p.lat for _, p in pairs], [p.lon for _, p in pairs]),
+                [ngo for ngo, _ in pairs],
+            )
+            for service, pairs in located.items()
+        }
+
+        # Rebuilt with the directory so new services are resolvable immediately;
+        # NGOs' own keywords extend the curated synonyms of their service
+        resolver = ServiceResolver(by_service.keys(), {
+            service: SERVICE_SYNONYMS.get(service, []) + sorted(keywords.get(service, ()))
+            for service in by_service
+        })
+
+        with self._lock:
+            self._by_service = by_service
+            self._resolver = resolver
+            self._by_service_country = by_service_country
+            self._spatial = spatial
+            self._located = sum(len(pairs) for pairs in located.values())
+            self._doc_count = count
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+            if from_snapshot:
+                self.snapshot_updates += 1
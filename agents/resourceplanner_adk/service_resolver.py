@@ -0,0 +1,160 @@
+# Free-text need -> canonical NGO service.
+# Every service in the directory is described by its own name plus its
+# synonym phrases; their unigrams and bigrams form a term x service weight
+# matrix. A batch of needs becomes one needs x terms query matrix, so scoring
+# the whole batch is a single matrix product. Both are dense NumPy arrays: a
+# directory has a handful of services and a few hundred terms, so most of
+# either matrix being zero costs less than a sparse format would.
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Curated phrases per canonical service. Only services present in the NGO
+# directory are indexed; "general aid" is the ReliefWeb catch-all.
+# This table only knows the services seeded today: a service added to the
+# directory later is matched by the words of its own name (and any "keywords"
+# its NGO documents list, see NgoIndex) until phrases are added here.
+SERVICE_SYNONYMS: Dict[str, List[str]] = {
+    "medical supplies": [
+        "medical", "medical aid", "medical care", "medical team", "medicine", "medication",
+        "first aid", "health", "health care", "healthcare", "doctor", "nurse", "hospital",
+        "clinic", "ambulance", "trauma care", "wound care", "surgery", "vaccine", "insulin",
+        "bandage", "drug", "pharmaceutical", "mental health", "blood", "paramedic",
+    ],
+    "food": [
+        "food aid", "meal", "ration", "nutrition", "hunger", "grocery", "rice", "flour",
+        "baby formula", "infant formula", "cooked meal", "food parcel", "famine", "malnutrition",
+        "food ration", "emergency food", "canned food",
+    ],
+    "shelter": [
+        "housing", "tent", "tarpaulin", "blanket", "sleeping bag", "temporary housing",
+        "evacuation centre", "evacuation center", "emergency shelter", "roof", "bedding",
+        "mattress", "displaced", "camp", "accommodation", "winterization", "heater",
+    ],
+    "general aid": [
+        "water", "drinking water", "clean water", "water supply", "bottled water", "water purification",
+        "sanitation", "hygiene", "hygiene kit", "toilet", "wash", "rescue", "search and rescue",
+        "rescue boat", "boat", "evacuation", "transport", "clothing", "clothes", "generator",
+        "power", "fuel", "communication", "volunteer", "debris removal", "cleanup", "logistics",
+        "humanitarian aid", "relief", "relief supplies", "emergency supplies",
+    ],
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP = {
+    "a", "an", "and", "the", "of", "for", "to", "in", "on", "with", "or", "at",
+    "need", "needs", "needed", "urgent", "urgently", "immediate", "more", "some",
+    "support", "assistance", "help", "provision",
+}
+BIGRAM_BOOST = 1.5
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text: str) -> List[str]:
+    """Stemmed unigrams plus adjacent bigrams ('rescue boat')."""
+    words = [_stem(w) for w in _WORD.findall(str(text or "").lower()) if w not in _STOP]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class ServiceResolver:
+    """
+    resolve_many(needs) -> for each need, [(service, score), ...] best first.
+    score is the weighted share of the need's terms that the service covers
+    (1.0 for an exact service name).
+    """
+
+    def __init__(
+        self,
+        services: Iterable[str],
+        synonyms: Optional[Dict[str, List[str]]] = None,
+        min_score: float = 0.34,
+        max_services: int = 2,
+    ):
+        self.services = sorted({s.strip().lower() for s in services if s and s.strip()})
+        self.min_score = min_score
+        self.max_services = max_services
+        synonyms = SERVICE_SYNONYMS if synonyms is None else synonyms
+
+        # Terms per service: its own name plus its synonyms
+        phrases: List[Tuple[int, List[str]]] = []
+        for j, service in enumerate(self.services):
+            phrases.append((j, terms(service)))
+            for phrase in synonyms.get(service, []):
+                phrases.append((j, terms(phrase)))
+
+        df: Dict[str, set] = {}
+        for j, ts in phrases:
+            for t in ts:
+                df.setdefault(t, set()).add(j)
+        self.vocab: Dict[str, int] = {t: i for i, t in enumerate(sorted(df))}
+
+        n = max(1, len(self.services))
+        idf = np.zeros(len(self.vocab), dtype=np.float32)
+        for t, i in self.vocab.items():
+            idf[i] = math.log(1.0 + n / len(df[t])) * (BIGRAM_BOOST if " " in t else 1.0)
+        self.idf = idf
+        # Query terms the directory has never seen still count against coverage
+        self.unknown_weight = float(np.median(idf)) if len(idf) else 1.0
+
+        # Column j holds idf(t) for every term t that service j knows
+        weights = np.zeros((len(self.vocab), n), dtype=np.float32)
+        for j, ts in phrases:
+            for t in ts:
+                weights[self.vocab[t], j] = 1.0
+        self.weights = weights * idf[:, None]
+        self._exact = {s: j for j, s in enumerate(self.services)}
+
+    def resolve_many(self, needs: Sequence[str]) -> List[List[Tuple[str, float]]]:
+        out: List[List[Tuple[str, float]]] = [[] for _ in needs]
+        if not needs or not self.services:
+            return out
+
+        rows, cols, unknown = [], [], np.zeros(len(needs), dtype=np.float32)
+        todo = []
+        for r, need in enumerate(needs):
+            key = str(need or "").strip().lower()
+            if key in self._exact:
+                out[r] = [(key, 1.0)]
+                continue
+            todo.append(r)
+            for t in set(terms(key)):
+                i = self.vocab.get(t)
+                if i is None:
+                    if " " not in t:
+                        unknown[r] += self.unknown_weight
+                else:
+                    rows.append(r)
+                    cols.append(i)
+        if not todo:
+            return out
+
+        query = np.zeros((len(needs), len(self.vocab)), dtype=np.float32)
+        if rows:
+            query[rows, cols] = 1.0
+        covered = query @ self.weights                      # needs x services
+        total = query @ self.idf + unknown                  # needs
+        scores = covered / np.maximum(total, 1e-6)[:, None]
+
+        top = np.argsort(-scores, axis=1)[:, : self.max_services]
+        for r in todo:
+            best = scores[r, top[r, 0]]
+            if best < self.min_score:
+                continue
+            out[r] = [
+                (self.services[j], round(float(scores[r, j]), 3))
+                for j in top[r]
+                if scores[r, j] >= self.min_score and scores[r, j] >= 0.5 * best
+            ]
+        return out
+
+    def resolve(self, need: str) -> List[Tuple[str, float]]:
+        return self.resolve_many([need])[0]
@@ -0,0 +1,105 @@
+# k-nearest-neighbour search over points on the Earth's surface.
+# Points are mapped to unit vectors, where straight-line (chord) distance is
+# monotonic in great-circle distance, and split into a KD-tree with
+# bounding boxes; a query visits nodes closest-box-first and stops once no
+# remaining box can beat the current k-th best.
+import heapq
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 64
+
+
+def unit_vectors(lat: Sequence[float], lon: Sequence[float]) -> np.ndarray:
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+class GeoKDTree:
+    """
+    nearest(lat, lon, k) -> [(point index, km), ...] nearest first.
+    Immutable once built; rebuild it when the points change.
+    """
+
+    def __init__(self, lat: Sequence[float], lon: Sequence[float], leaf_size: int = LEAF_SIZE):
+        self.xyz = unit_vectors(lat, lon).reshape(-1, 3)
+        self.leaf_size = max(1, leaf_size)
+        self.order = np.arange(len(self.xyz))
+        # Node arrays: [lo, hi) range of self.order, children (-1 for a leaf), bounding box
+        self._range: List[Tuple[int, int]] = []
+        self._children: List[Tuple[int, int]] = []
+        self._lo: List[Tuple[float, float, float]] = []
+        self._hi: List[Tuple[float, float, float]] = []
+        if len(self.xyz):
+            self._build(0, len(self.xyz))
+
+    def __len__(self) -> int:
+        return len(self.xyz)
+
+    def _build(self, lo: int, hi: int) -> int:
+        node = len(self._range)
+        pts = self.xyz[self.order[lo:hi]]
+        self._range.append((lo, hi))
+        self._children.append((-1, -1))
+        # Plain tuples: per-node box tests are cheaper in Python than in NumPy
+        self._lo.append(tuple(pts.min(axis=0).tolist()))
+        self._hi.append(tuple(pts.max(axis=0).tolist()))
+        if hi - lo > self.leaf_size:
+            axis = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+            idx = self.order[lo:hi]
+            self.order[lo:hi] = idx[np.argsort(self.xyz[idx, axis], kind="stable")]
+            mid = (lo + hi) // 2
+            left = self._build(lo, mid)
+            right = self._build(mid, hi)
+            self._children[node] = (left, right)
+        return node
+
+    def _box_distance(self, node: int, q: Tuple[float, float, float]) -> float:
+        total = 0.0
+        for lo, hi, x in zip(self._lo[node], self._hi[node], q):
+            gap = lo - x if x < lo else x - hi if x > hi else 0.0
+            total += gap * gap
+        return total ** 0.5
+
+    def nearest(self, lat: float, lon: float, k: int = 5) -> List[Tuple[int, float]]:
+        if not len(self.xyz) or k <= 0:
+            return []
+        q = unit_vectors([lat], [lon])[0]
+        qt = tuple(q.tolist())
+        best: List[Tuple[float, int]] = []  # max-heap of (-chord, index)
+        frontier = [(0.0, 0)]
+        while frontier:
+            bound, node = heapq.heappop(frontier)
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            left, right = self._children[node]
+            if left < 0:
+                lo, hi = self._range[node]
+                idx = self.order[lo:hi]
+                diff = self.xyz[idx] - q
+                dist = np.sqrt((diff * diff).sum(axis=1))
+                if len(best) == k:
+                    keep = dist < -best[0][0]
+                    idx, dist = idx[keep], dist[keep]
+                if len(idx) > k:
+                    top = np.argpartition(dist, k - 1)[:k]
+                    idx, dist = idx[top], dist[top]
+                for i, d in zip(idx.tolist(), dist.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, i))
+                continue
+            for child in (left, right):
+                heapq.heappush(frontier, (self._box_distance(child, qt), child))
+
+        best.sort(reverse=True)
+        return [(i, float(chord_to_km(-d))) for d, i in best]
@@ -0,0 +1,91 @@
+# Rolling aggregates for incremental ReportWriter runs.
+# Counts per disaster type, country, need and NGO are persisted in
+# metadata/report_aggregates and merged with each run's new window, so a run
+# only reads documents created since the previous watermark.
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+AGGREGATES_DOC = "report_aggregates"
+
+
+def empty_aggregates() -> Dict[str, Any]:
+    return {
+        "incidents_total": 0,
+        "matches_total": 0,
+        "by_type": {},
+        "by_country": {},
+        "by_need": {},
+        "by_ngo": {},
+    }
+
+
+def _bump(counts: Dict[str, int], key: Any) -> None:
+    key = str(key or "").strip().lower() or "unknown"
+    counts[key] = counts.get(key, 0) + 1
+
+
+def merge_window(agg: Dict[str, Any], incidents: Iterable[Dict[str, Any]], matches: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fold a window of new incidents/matches into `agg` (in place) and return it.
+    The planner keeps a match's created_at when it re-plans the incident, so a
+    match falls in one window only and is counted once, by its first plan.
+    """
+    for inc in incidents:
+        agg["incidents_total"] += 1
+        _bump(agg["by_type"], inc.get("disaster_type") or inc.get("type"))
+        _bump(agg["by_country"], inc.get("country") or inc.get("location"))
+        needs = inc.get("needs") or []
+        for need in needs if isinstance(needs, list) else [needs]:
+            _bump(agg["by_need"], need)
+    for m in matches:
+        agg["matches_total"] += 1
+        for ngo in m.get("matches") or []:
+            if isinstance(ngo, dict):
+                _bump(agg["by_ngo"], ngo.get("name"))
+    return agg
+
+
+def top(counts: Dict[str, int], n: int = 15) -> List[Tuple[str, int]]:
+    return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+
+def summarize_aggregates(agg: Dict[str, Any], n: int = 15) -> Dict[str, Any]:
+    """Compact view for the prompt: totals plus the top-n of each breakdown."""
+    return {
+        "incidents_total": agg["incidents_total"],
+        "matches_total": agg["matches_total"],
+        "top_types": top(agg["by_type"], n),
+        "top_countries": top(agg["by_country"], n),
+        "top_needs": top(agg["by_need"], n),
+        "top_ngos": top(agg["by_ngo"], n),
+    }
+
+
+def load_state(db) -> Tuple[Dict[str, Any], Dict[str, Optional[Dict[str, Any]]]]:
+    """(aggregates, {"incidents": watermark, "matches": watermark}) from Firestore."""
+    meta = db.collection("metadata")
+    agg = meta.document(AGGREGATES_DOC).get().to_dict() or {}
+    state = empty_aggregates()
+    state.update({k: agg[k] for k in state if k in agg})
+    latest = meta.document("latest_report").get().to_dict() or {}
+    return state, {
+        "incidents": latest.get("incidents_watermark"),
+        "matches": latest.get("matches_watermark"),
+    }
+
+
+def fetch_since(db, collection: str, watermark: Optional[Dict[str, Any]]):
+    """
+    Documents created after `watermark` ({"t": datetime, "id": doc id}), oldest
+    first. Returns (dicts, new watermark).
+    """
+    q = db.collection(collection).order_by("created_at").order_by("__name__")
+    if watermark and watermark.get("t") is not None:
+        q = q.start_after({"created_at": watermark["t"], "__name__": watermark["id"]})
+    docs, last = [], None
+    for d in q.stream():
+        docs.append({**(d.to_dict() or {}), "id": d.id})
+        last = d
+    if last is None:
+        return docs, watermark
+    return docs, {"t": last.get("created_at"), "id": last.id}
+
@@ -0,0 +1,117 @@
+# Serialization time and prompt size: packed incident table vs the previous
+# approach (_clean walk + one JSON line per incident and per match).
+#
+#   python bench_prompt.py [--incidents 5000] [--budget 40000]
+#
+# Uses synthetic records, so it needs no Firestore or Vertex access (the
+# job's requirements must still be installed for the job_main import).
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from job_main import REPORT_ALIASES, _report_priority, _report_rows
+from mapreduce import split_records
+from prompt_packer import estimate_tokens, pack
+
+TYPES = ["flood", "wildfire", "earthquake", "hurricane", "drought"]
+NEEDS = ["food", "water", "shelter", "medical supplies", "rescue", "blankets"]
+PLACES = [("Dhaka", "Bangladesh"), ("Accra", "Ghana"), ("Lima", "Peru"), ("Cebu", "Philippines")]
+
+
+def synthetic(n, match_ratio=0.7, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    incidents, matches = [], []
+    for i in range(n):
+        loc, country = rng.choice(PLACES)
+        inc = {
+            "id": f"inc{i}",
+            "location": loc,
+            "country": country,
+            "disaster_type": rng.choice(TYPES),
+            "summary": f"{rng.choice(TYPES).title()} reported near {loc}; roads cut, "
+                       f"{rng.randint(10, 5000)} people displaced, local shelters at capacity.",
+            "needs": rng.sample(NEEDS, rng.randint(1, 3)),
+            "source": "",
+            "created_at": start + timedelta(minutes=i),
+        }
+        incidents.append(inc)
+        if rng.random() < match_ratio:
+            matches.append({
+                "id": inc["id"],
+                "incident_id": inc["id"],
+                "incident": {k: v for k, v in inc.items() if k not in ("id", "created_at")},
+                "matches": [
+                    {"name": f"NGO {rng.randint(1, 60)}", "service": need, "country": country}
+                    for need in inc["needs"]
+                ],
+                "created_at": inc["created_at"] + timedelta(seconds=30),
+            })
+    return incidents, matches
+
+
+def _clean(obj):
+    # The pre-packer timestamp conversion, kept here for comparison
+    if isinstance(obj, dict):
+        return {k: _clean(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_clean(v) for v in obj]
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return obj
+
+
+def timed(fn, repeat=3):
+    best, out = None, None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return out, best * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--incidents", type=int, default=5000)
+    ap.add_argument("--budget", type=int, default=40000, help="token budget for the packed prompt")
+    args = ap.parse_args()
+
+    incidents, matches = synthetic(args.incidents)
+
+    def before():
+        inc, mat = _clean(incidents), _clean(matches)
+        return "\n".join(
+            split_records(inc, 10**9, "INCIDENTS (JSON lines):\n")
+            + split_records(mat, 10**9, "MATCHES (JSON lines):\n")
+        )
+
+    def after_all():
+        return pack(_report_rows(incidents, matches), 10**9, priority=_report_priority, aliases=REPORT_ALIASES)
+
+    def after_budget():
+        return pack(_report_rows(incidents, matches), args.budget, priority=_report_priority, aliases=REPORT_ALIASES)
+
+    old, old_ms = timed(before)
+    full, full_ms = timed(after_all)
+    fit, fit_ms = timed(after_budget)
+
+    print(json.dumps({
+        "incidents": len(incidents),
+        "matches": len(matches),
+        "json_lines": {"ms": round(old_ms, 1), "chars": len(old), "est_tokens": estimate_tokens(old)},
+        "packed_table": {"ms": round(full_ms, 1), "chars": len(full.text), "est_tokens": full.tokens},
+        "packed_budget": {
+            "ms": round(fit_ms, 1),
+            "budget": args.budget,
+            "est_tokens": fit.tokens,
+            "included": len(fit.included),
+            "omitted": len(fit.omitted),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# Streaming columnar export of incidents and matches.
+# Documents are read from Firestore one page at a time, flattened into a fixed
+# schema and written to CSV, gzipped JSONL and Parquet in the same pass, so
+# peak memory is one page plus the upload buffers regardless of data volume.
+# Files are only committed once every page is written; a failed export leaves
+# no partial files behind.
+import csv
+import gzip
+import io
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+INCIDENT_FIELDS = [
+    "incident_id", "created_at", "timestamp", "location", "country",
+    "disaster_type", "summary", "needs", "need_count",
+]
+# One row per matched NGO, so counts per NGO/service are a plain GROUP BY
+MATCH_FIELDS = [
+    "match_id", "incident_id", "created_at", "location", "country",
+    "disaster_type", "need_count", "ngo_name", "ngo_service", "ngo_country",
+]
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSIONS = {"csv": "csv", "jsonl": "jsonl.gz", "parquet": "parquet"}
+
+
+def _iso(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _needs(obj: Dict[str, Any]) -> List[str]:
+    needs = obj.get("needs") or []
+    return [str(n) for n in (needs if isinstance(needs, list) else [needs])]
+
+
+def flatten_incident(doc_id: str, d: Dict[str, Any]) -> Dict[str, Any]:
+    needs = _needs(d)
+    return {
+        "incident_id": doc_id,
+        "created_at": _iso(d.get("created_at")),
+        "timestamp": _iso(d.get("timestamp")),
+        "location": d.get("location"),
+        "country": d.get("country"),
+        "disaster_type": d.get("disaster_type") or d.get("type"),
+        "summary": d.get("summary"),
+        "needs": "; ".join(needs),
+        "need_count": len(needs),
+    }
+
+
+def flatten_match(doc_id: str, d: Dict[str, Any]) -> List[Dict[str, Any]]:
+    incident = d.get("incident") or {}
+    base = {
+        "match_id": doc_id,
+        "incident_id": d.get("incident_id"),
+        "created_at": _iso(d.get("created_at")),
+        "location": incident.get("location"),
+        "country": incident.get("country"),
+        "disaster_type": incident.get("disaster_type") or incident.get("type"),
+        "need_count": len(_needs(incident)),
+    }
+    ngos = [n for n in d.get("matches") or [] if isinstance(n, dict)]
+    if not ngos:
+        return [{**base, "ngo_name": None, "ngo_service": None, "ngo_country": None}]
+    return [
+        {**base, "ngo_name": n.get("name"), "ngo_service": n.get("service"), "ngo_country": n.get("country")}
+        for n in ngos
+    ]
+
+
+def iter_pages(db, collection: str, page_size: int = 500) -> Iterator[List[Any]]:
+    """Yield snapshots of `collection` in document-id order, page_size at a time."""
+    col = db.collection(collection)
+    cursor = None
+    while True:
+        q = col.order_by("__name__").limit(page_size)
+        if cursor is not None:
+            q = q.start_after(cursor)
+        page = list(q.stream())
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+
+# ---------- sinks ----------
+
+class GCSSink:
+    """Chunked resumable uploads to gs://bucket/prefix/..."""
+
+    def __init__(self, bucket: str, prefix: str, chunk_bytes: int = 8 * 1024 * 1024, client=None):
+        from google.cloud import storage
+        self.bucket = (client or storage.Client()).bucket(bucket)
+        self.prefix = prefix.strip("/")
+        # Resumable chunks must be a multiple of 256 KiB
+        self.chunk_bytes = max(1, chunk_bytes // (256 * 1024)) * 256 * 1024
+
+    def open(self, name: str, content_type: str):
+        blob = self.bucket.blob(f"{self.prefix}/{name}")
+        return blob.open("wb", chunk_size=self.chunk_bytes, content_type=content_type, ignore_flush=True)
+
+    def uri(self, name: str) -> str:
+        return f"gs://{self.bucket.name}/{self.prefix}/{name}"
+
+    def delete(self, name: str) -> None:
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.blob(f"{self.prefix}/{name}").delete()
+        except NotFound:
+            pass
+
+    def abort(self, name: str, raw) -> None:
+        """
+        Drop a partly written object. BlobWriter cannot cancel its upload, so
+        closing it finalizes whatever was sent and the object is then deleted.
+        """
+        try:
+            raw.close()
+        except Exception:
+            pass  # not finalized; delete anyway in case it was
+        self.delete(name)
+
+
+class LocalSink:
+    """Filesystem stand-in for GCSSink (local runs and tests)."""
+
+    def __init__(self, root: str, prefix: str = ""):
+        self.root = os.path.join(root, prefix.strip("/"))
+
+    def open(self, name: str, content_type: str):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, "wb")
+
+    def uri(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def delete(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.root, name))
+        except FileNotFoundError:
+            pass
+
+    def abort(self, name: str, raw) -> None:
+        raw.close()
+        self.delete(name)
+
+
+# ---------- writers ----------
+# close() writes the trailer and commits the file; abort() lets go of the
+# format state without writing to `raw`, which the sink then discards.
+
+class _CsvWriter:
+    def __init__(self, raw, fields: Sequence[str]):
+        self.text = io.TextIOWrapper(raw, encoding="utf-8", newline="", write_through=True)
+        self.csv = csv.DictWriter(self.text, fieldnames=list(fields))
+        self.csv.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self.csv.writerows(rows)
+
+    def close(self) -> None:
+        self.text.close()
+
+    def abort(self) -> None:
+        self.text.detach()
+
+
+class _JsonlWriter:
+    def __init__(self, raw, fields: Sequence[str]):
+        self.raw = raw
+        self.gz = gzip.GzipFile(fileobj=raw, mode="wb")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self.gz.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode("utf-8"))
+
+    def close(self) -> None:
+        self.gz.close()  # does not close fileobj
+        self.raw.close()
+
+    def abort(self) -> None:
+        self.gz.fileobj = None  # close() is then a no-op
+
+
+class _ParquetWriter:
+    def __init__(self, raw, fields: Sequence[str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.raw = raw
+        self.fields = list(fields)
+        self.schema = pa.schema([
+            (f, pa.int64() if f.endswith("_count") else pa.string()) for f in self.fields
+        ])
+        self.writer = pq.ParquetWriter(raw, self.schema, compression="snappy")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        if rows:
+            # One row group per page keeps the writer's buffer bounded
+            self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+        self.raw.close()
+
+    def abort(self) -> None:
+        self.writer.is_open = False  # no footer on close()
+
+
+WRITERS = {"csv": _CsvWriter, "jsonl": _JsonlWriter, "parquet": _ParquetWriter}
+
+
+def export_collection(
+    db,
+    sink,
+    collection: str,
+    fields: Sequence[str],
+    flatten: Callable[[str, Dict[str, Any]], Any],
+    formats: Sequence[str] = ("csv", "jsonl", "parquet"),
+    page_size: int = 500,
+) -> Dict[str, Any]:
+    """
+    Stream `collection` through `flatten` into every requested format.
+    flatten(doc_id, dict) returns a row or a list of rows.
+    Files are closed (committed) only after the last page; on any error they
+    are all discarded and the error re-raised.
+    Returns {"docs", "rows", "files": {format: uri}}.
+    """
+    opened, writers, files = {}, {}, {}
+    try:
+        for fmt in formats:
+            name = f"{collection}.{EXTENSIONS[fmt]}"
+            opened[fmt] = (name, sink.open(name, CONTENT_TYPES[fmt]))
+            writers[fmt] = WRITERS[fmt](opened[fmt][1], fields)
+            files[fmt] = sink.uri(name)
+
+        docs = rows = 0
+        for page in iter_pages(db, collection, page_size):
+            batch: List[Dict[str, Any]] = []
+            for snap in page:
+                out = flatten(snap.id, snap.to_dict() or {})
+                batch.extend(out if isinstance(out, list) else [out])
+            for w in writers.values():
+                w.write(batch)
+            docs += len(page)
+            rows += len(batch)
+
+        for fmt in list(writers):
+            writers.pop(fmt).close()
+    except BaseException:
+        # Already committed files go too: the export is all formats or none
+        for fmt, (name, raw) in opened.items():
+            if fmt in writers:
+                writers[fmt].abort()
+            sink.abort(name, raw)
+        raise
+    return {"docs": docs, "rows": rows, "files": files}
+
+
+def export_all(db, sink, formats: Sequence[str] = ("csv", "jsonl", "parquet"), page_size: int = 500) -> Dict[str, Any]:
+    """Both collections; if one fails, the other's files are deleted as well."""
+    tables = [("incidents", INCIDENT_FIELDS, flatten_incident), ("matches", MATCH_FIELDS, flatten_match)]
+    result: Dict[str, Any] = {}
+    try:
+        for collection, fields, flatten in tables:
+            result[collection] = export_collection(db, sink, collection, fields, flatten, formats, page_size)
+    except BaseException:
+        for collection in result:
+            for fmt in formats:
+                sink.delete(f"{collection}.{EXTENSIONS[fmt]}")
+        raise
+    return result
@@ -1,9 +1,16 @@
-import os, json, requests
+import os, json, sys
 from datetime import datetime
 from google.cloud import firestore, storage
 from vertexai import init
 from vertexai.preview.generative_models import GenerativeModel
 from dotenv import load_dotenv
+from export import GCSSink, LocalSink, export_all
+from mapreduce import MapReduceSummarizer, FirestoreChunkCache
+from prompt_packer import pack, pack_chunks
+from aggregates import (
+    AGGREGATES_DOC, empty_aggregates, fetch_since,
+    load_state, merge_window, summarize_aggregates,
+)
 
 # --- Load .env if present (local only) ---
 if os.path.exists(".env"):
@@ -16,37 +23,150 @@ DATASCOUT = os.getenv("DATASCOUT_URL")
 PLANNER   = os.getenv("RESOURCEPLANNER_URL")
 SPEECH    = os.getenv("SPEECH_URL")
 
+# Prompt budget (estimated tokens): above this, the highest-priority incidents
+# go in verbatim and the rest are summarized in chunks and merged
+REPORT_PROMPT_TOKENS = int(os.getenv("REPORT_PROMPT_TOKENS", "40000"))
+REPORT_CHUNK_TOKENS  = int(os.getenv("REPORT_CHUNK_TOKENS", "15000"))
+REPORT_WORKERS       = int(os.getenv("REPORT_WORKERS", "4"))
+
+# Short column names for the packed incident table
+REPORT_ALIASES = {
+    "created_at": "t", "location": "loc", "country": "cc",
+    "disaster_type": "type", "severity": "sev", "summary": "sum",
+}
+TABLE_LEGEND = (
+    "Incidents are pipe-separated rows; the first line names the columns: "
+    "t=created (UTC), loc=location, cc=country, type=disaster type, sev=severity, "
+    "sum=summary, needs and ngos are ';'-separated, empty ngos = no NGO matched."
+)
+
+# Columnar export (no LLM involved). It re-reads every document, so it is not
+# part of report runs: schedule it on its own with --export-only / REPORT_EXPORT_ONLY=1
+EXPORT_FORMATS     = [f for f in os.getenv("EXPORT_FORMATS", "csv,jsonl,parquet").split(",") if f.strip()]
+EXPORT_PAGE_SIZE   = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(8 * 1024 * 1024)))
+EXPORT_LOCAL_DIR   = os.getenv("EXPORT_LOCAL_DIR")  # write here instead of GCS
+
+MAP_PROMPT = """
+Summarize this slice of crisis data for a situation report. Keep exact counts,
+disaster types, locations, severities, needs and matched NGOs. Markdown only.
+""" + TABLE_LEGEND + """
+{content}
+"""
+
+REDUCE_PROMPT = """
+Merge these partial situation-report summaries into one. Add up counts and keep
+every location, need and NGO mentioned. Markdown only.
+{content}
+"""
+
 def fetch_data():
+    """
+    Every incident and match in (created_at, __name__) order, with the
+    watermarks of the last documents read: a document written during the read
+    sorts after them and is picked up by the next incremental run.
+    Returns (incidents, matches, db, watermarks).
+    """
     db = firestore.Client(database="crisisconnect")
-    inc = [d.to_dict() for d in db.collection("incidents").stream()]
-    mat = [d.to_dict() for d in db.collection("matches").stream()]
-    return inc, mat, db
-
-def generate_report(incidents, matches):
-    # 🔧 Convert Firestore timestamps to ISO strings
-    def _clean(obj):
-        if isinstance(obj, dict):
-            return {k: _clean(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [_clean(v) for v in obj]
-        elif hasattr(obj, "isoformat"):  # handles DatetimeWithNanoseconds
-            try:
-                return obj.isoformat()
-            except Exception:
-                return str(obj)
-        return obj
-
-    incidents = _clean(incidents)
-    matches = _clean(matches)
+    inc, inc_mark = fetch_since(db, "incidents", None)
+    mat, mat_mark = fetch_since(db, "matches", None)
+    return inc, mat, db, {"incidents": inc_mark, "matches": mat_mark}
+
+def fetch_incremental(db):
+    """
+    Only documents created since the last run's watermarks, merged into the
+    persisted rolling aggregates. Returns (new incidents, new matches, aggregates, watermarks).
+    """
+    agg, marks = load_state(db)
+    incidents, marks["incidents"] = fetch_since(db, "incidents", marks["incidents"])
+    matches, marks["matches"] = fetch_since(db, "matches", marks["matches"])
+    return incidents, matches, merge_window(agg, incidents, matches), marks
+
+def _report_rows(incidents, matches):
+    """
+    One row per incident with the names of its matched NGOs (empty = unmatched).
+    Matches whose incident is not among `incidents` (older incidents in an
+    incremental run) add a row built from the incident embedded in the match.
+    """
+    ngos, embedded = {}, {}
+    for m in matches:
+        iid = m.get("incident_id") or m.get("id")
+        ngos.setdefault(iid, []).extend(
+            n["name"] for n in m.get("matches") or [] if isinstance(n, dict) and n.get("name")
+        )
+        embedded.setdefault(iid, m.get("incident") or {})
+
+    def row(inc, names):
+        return {
+            "created_at": inc.get("created_at") or inc.get("timestamp"),
+            "location": inc.get("location"),
+            "country": inc.get("country"),
+            "disaster_type": inc.get("disaster_type") or inc.get("type"),
+            "severity": inc.get("severity"),
+            "needs": inc.get("needs"),
+            "ngos": sorted(set(names)),
+            "summary": inc.get("summary"),
+        }
+
+    rows = [row(inc, ngos.pop(inc.get("id"), [])) for inc in incidents]
+    rows += [row(embedded[iid], names) for iid, names in ngos.items()]
+    return rows
 
+def _report_priority(row):
+    # Unmatched first, then most severe, then newest
+    t = row.get("created_at")
+    return (not row["ngos"], row.get("severity") or 0, t.isoformat() if hasattr(t, "isoformat") else str(t or ""))
+
+def generate_report(incidents, matches, db=None, totals=None):
     init(project=PROJECT, location=LOCATION)
     model = GenerativeModel("gemini-2.5-flash")
+    generate = lambda prompt: model.generate_content(prompt).text
+
+    rows = _report_rows(incidents, matches)
+    matched = sum(1 for r in rows if r["ngos"])
+
+    # Incremental runs: all-time totals plus the records new since the last report
+    context = ""
+    if totals is not None:
+        context = (
+            f"CUMULATIVE TOTALS (all time): {json.dumps(totals, separators=(',', ':'))}\n"
+            "The incidents below are only those new since the previous report.\n"
+        )
+
+    packed = pack(rows, REPORT_PROMPT_TOKENS, priority=_report_priority, aliases=REPORT_ALIASES, label="incidents")
+    if not packed.omitted:
+        prompt = f"""
+    Create a Markdown Situation Report from the following {len(rows)} incidents ({matched} matched to NGOs).
+    {TABLE_LEGEND}
+    {context}{packed.text}
+    """
+        return generate(prompt)
+
+    # Half the budget for the top incidents verbatim, half for summaries of the rest
+    direct = pack(rows, REPORT_PROMPT_TOKENS // 2, priority=_report_priority, aliases=REPORT_ALIASES, label="incidents")
+    chunks = pack_chunks(direct.omitted, REPORT_CHUNK_TOKENS, aliases=REPORT_ALIASES, label="incidents")
+    mr = MapReduceSummarizer(
+        generate,
+        MAP_PROMPT,
+        REDUCE_PROMPT,
+        max_chars=REPORT_PROMPT_TOKENS * 2,  # ~4 chars per token, half the budget
+        workers=REPORT_WORKERS,
+        cache=FirestoreChunkCache(db) if db is not None else None,
+    )
+    partials = mr.condense(chunks)
+    print(f"Packed {len(direct.included)} incidents ({direct.tokens} tokens); "
+          f"map-reduce over {len(chunks)} chunks for {len(direct.omitted)} more: {mr.stats()}")
     prompt = f"""
-    Create a Markdown Situation Report from the following:
-    INCIDENTS: {json.dumps(incidents)[:80000]}
-    MATCHES: {json.dumps(matches)[:80000]}
+    Create a Markdown Situation Report covering all {len(rows)} incidents ({matched} matched to NGOs).
+    {TABLE_LEGEND}
+    {context}
+    The highest-priority incidents (unmatched, most severe and newest first):
+    {direct.text}
+
+    Summaries of the remaining {len(direct.omitted)} incidents:
+    {partials}
     """
-    return model.generate_content(prompt).text
+    return generate(prompt)
 
 
 def upload_to_gcs(content):
@@ -57,19 +177,62 @@ def upload_to_gcs(content):
     blob.upload_from_string(content, content_type="text/markdown")
     return f"gs://{BUCKET}/{fname}"
 
-def update_metadata(db, url):
-    db.collection("metadata").document("latest_report").set({
+def export_tables(db):
+    """
+    Stream incidents/matches to exports/<timestamp>/ as CSV, JSONL.gz and
+    Parquet, and point metadata/latest_export at the files.
+    """
+    prefix = f"exports/{datetime.utcnow().strftime('%Y-%m-%d_%H-%M')}"
+    if EXPORT_LOCAL_DIR:
+        sink = LocalSink(EXPORT_LOCAL_DIR, prefix)
+    else:
+        sink = GCSSink(BUCKET, prefix, chunk_bytes=EXPORT_CHUNK_BYTES)
+    result = export_all(db, sink, [f.strip() for f in EXPORT_FORMATS], page_size=EXPORT_PAGE_SIZE)
+    for name, r in result.items():
+        print(f"Exported {name}: {r['docs']} docs, {r['rows']} rows -> {', '.join(r['files'].values())}")
+    files = {name: r["files"] for name, r in result.items()}
+    db.collection("metadata").document("latest_export").set({
+        "timestamp": datetime.utcnow().isoformat(),
+        "files": files,
+    })
+    return files
+
+def update_metadata(db, url, watermarks=None, aggregates=None):
+    """Latest report pointer, plus (atomically) the new watermarks and aggregates."""
+    meta = db.collection("metadata")
+    batch = db.batch()
+    batch.set(meta.document("latest_report"), {
         "timestamp": datetime.utcnow().isoformat(),
         "report_url": url,
         "datascout_url": DATASCOUT,
         "planner_url": PLANNER,
-        "speech_url": SPEECH
+        "speech_url": SPEECH,
+        "incidents_watermark": (watermarks or {}).get("incidents"),
+        "matches_watermark": (watermarks or {}).get("matches"),
     })
+    if aggregates is not None:
+        batch.set(meta.document(AGGREGATES_DOC), {**aggregates, "updated_at": firestore.SERVER_TIMESTAMP})
+    batch.commit()
 
 if __name__ == "__main__":
-    incidents, matches, db = fetch_data()
+    # Full rebuild re-reads everything and recomputes the rolling aggregates
+    full = "--full" in sys.argv or os.getenv("REPORT_FULL_REBUILD") == "1"
+
+    if "--export-only" in sys.argv or os.getenv("REPORT_EXPORT_ONLY") == "1":
+        db = firestore.Client(database="crisisconnect")
+        export_tables(db)
+        sys.exit(0)
+
+    if full:
+        incidents, matches, db, watermarks = fetch_data()
+        aggregates = merge_window(empty_aggregates(), incidents, matches)
+        report = generate_report(incidents, matches, db)
+    else:
+        db = firestore.Client(database="crisisconnect")
+        incidents, matches, aggregates, watermarks = fetch_incremental(db)
+        print(f"Incremental window: {len(incidents)} incidents, {len(matches)} matches")
+        report = generate_report(incidents, matches, db, totals=summarize_aggregates(aggregates))
 
-    report = generate_report(incidents, matches)
     url = upload_to_gcs(report)
-    update_metadata(db, url)
+    update_metadata(db, url, watermarks, aggregates)
     print("✅ ReportWriter complete:", url)
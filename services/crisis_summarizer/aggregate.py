@@ -0,0 +1,71 @@
+# Deterministic aggregation for /summarize.
+# One columnar pass over the reports gives the per-type/per-status numbers and
+# top needs, so the model only has to write the narrative.
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Sequence
+
+_NEED_SPLIT = re.compile(r",|;|/|\band\b|\n", re.IGNORECASE)
+
+
+def split_needs(needs: str) -> List[str]:
+    return [n.strip().lower() for n in _NEED_SPLIT.split(needs or "") if n.strip()]
+
+
+def _group(keys: Sequence[str], severities: Sequence[int]) -> Dict[str, Dict[str, Any]]:
+    count: Dict[str, int] = defaultdict(int)
+    total: Dict[str, int] = defaultdict(int)
+    peak: Dict[str, int] = defaultdict(int)
+    for k, sev in zip(keys, severities):
+        count[k] += 1
+        total[k] += sev
+        peak[k] = max(peak[k], sev)
+    return {
+        k: {"count": count[k], "mean_severity": round(total[k] / count[k], 2), "max_severity": peak[k]}
+        for k in sorted(count, key=lambda k: (-count[k], k))
+    }
+
+
+def aggregate_reports(reports: Sequence[Any], top_n: int = 10) -> Dict[str, Any]:
+    """
+    reports: IncidentReport-like objects (location, type, severity, status, needs).
+    Returns counts and mean/max severity per type and per status, top needs and
+    the severity distribution.
+    """
+    types = [r.type.strip() or "Unknown" for r in reports]
+    statuses = [r.status.strip() or "Unknown" for r in reports]
+    severities = [int(r.severity) for r in reports]
+    needs = Counter(n for r in reports for n in split_needs(r.needs))
+
+    total = len(severities)
+    histogram = Counter(severities)
+    return {
+        "total": total,
+        "mean_severity": round(sum(severities) / total, 2) if total else 0.0,
+        "max_severity": max(severities) if total else 0,
+        "severity_histogram": {s: histogram.get(s, 0) for s in range(1, 6)},
+        "by_type": _group(types, severities),
+        "by_status": _group(statuses, severities),
+        "top_needs": needs.most_common(top_n),
+        "locations": len({r.location.strip().lower() for r in reports}),
+    }
+
+
+def render_table(agg: Dict[str, Any]) -> str:
+    """Markdown tables for incidents by type and by status."""
+    lines = [
+        f"**{agg['total']} incidents across {agg['locations']} locations** "
+        f"(mean severity {agg['mean_severity']}, max {agg['max_severity']})",
+        "",
+        "| Type | Incidents | Avg severity | Max severity |",
+        "|---|---:|---:|---:|",
+    ]
+    lines += [
+        f"| {t} | {g['count']} | {g['mean_severity']} | {g['max_severity']} |"
+        for t, g in agg["by_type"].items()
+    ]
+    lines += ["", "| Status | Incidents | Avg severity |", "|---|---:|---:|"]
+    lines += [f"| {s} | {g['count']} | {g['mean_severity']} |" for s, g in agg["by_status"].items()]
+    if agg["top_needs"]:
+        lines += ["", "**Top needs:** " + ", ".join(f"{n} ({c})" for n, c in agg["top_needs"])]
+    return "\n".join(lines)
@@ -1,12 +1,19 @@
+import asyncio
+import hashlib
 import os
+import json
+import time
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import PlainTextResponse  # <--- 1. IMPORT THIS
+from fastapi.responses import PlainTextResponse, StreamingResponse  # <--- 1. IMPORT THIS
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Any, Dict, List, Optional
 import vertexai
 from vertexai.generative_models import GenerativeModel, Part
 from google.api_core.exceptions import ResourceExhausted
 from google.cloud import firestore, storage
+from aggregate import aggregate_reports, render_table
+from mapreduce import MapReduceSummarizer, FirestoreChunkCache, split_markdown
+from prompt_packer import pack
 
 # --- Configuration ---
 # Initialize Vertex AI SDK
@@ -18,6 +25,74 @@ vertexai.init(project=PROJECT_ID, location=LOCATION)
 PRIMARY_MODEL = "gemini-2.5-pro"
 FALLBACK_MODEL = "gemini-1.5-flash-001"
 
+# Bump when the summarize_latest prompt changes so stored summaries are not reused
+SUMMARY_PROMPT_VERSION = "v1"
+SUMMARY_CACHE_ITEMS = 32
+
+# Reports passed verbatim to /summarize's narrative (at most this many, within
+# the token budget); everything else is aggregated
+SUMMARY_SAMPLE_SIZE = int(os.environ.get("SUMMARY_SAMPLE_SIZE", "20"))
+SUMMARY_SAMPLE_TOKENS = int(os.environ.get("SUMMARY_SAMPLE_TOKENS", "4000"))
+
+# --- Shared clients (created once, reused across requests) ---
+_clients: Dict[str, Any] = {}
+_models: Dict[str, GenerativeModel] = {}
+
+# summarize_latest: cached text by report key, and in-flight calls to coalesce
+# (plain and streamed)
+_summary_cache: Dict[str, str] = {}
+_inflight: Dict[str, asyncio.Future] = {}
+_streams: Dict[str, "_SharedStream"] = {}
+
+# Reports longer than this are summarized section by section, then merged
+REPORT_MAX_PROMPT_CHARS = int(os.environ.get("REPORT_MAX_PROMPT_CHARS", "120000"))
+REPORT_CHUNK_CHARS = int(os.environ.get("REPORT_CHUNK_CHARS", "40000"))
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "4"))
+
+MAP_PROMPT = """
+Summarize this section of a Markdown situation report. Keep exact statistics,
+affected regions and priorities. Markdown only.
+{content}
+"""
+
+REDUCE_PROMPT = """
+Merge these partial summaries of one situation report. Add up statistics and keep
+every affected region and priority. Markdown only.
+{content}
+"""
+
+# Streamed responses are Markdown sent as it is generated
+STREAM_MEDIA_TYPE = "text/markdown; charset=utf-8"
+
+# Generation timings reported by /stats (time to first token and total)
+_timings: Dict[str, Any] = {
+    "generations": 0,
+    "streamed": 0,
+    "last_ttft_ms": None,
+    "last_total_ms": None,
+    "avg_ttft_ms": 0.0,
+    "avg_total_ms": 0.0,
+}
+
+
+def _firestore() -> firestore.Client:
+    if "firestore" not in _clients:
+        _clients["firestore"] = firestore.Client(database="crisisconnect")
+    return _clients["firestore"]
+
+
+def _storage() -> storage.Client:
+    if "storage" not in _clients:
+        _clients["storage"] = storage.Client()
+    return _clients["storage"]
+
+
+def _model(name: str) -> GenerativeModel:
+    if name not in _models:
+        _models[name] = GenerativeModel(name)
+    return _models[name]
+
+
 # --- Pydantic Models ---
 class IncidentReport(BaseModel):
     """Data model for a single incident report."""
@@ -40,44 +115,66 @@ app = FastAPI(
 
 # 2. USE PlainTextResponse IN THE DECORATOR
 @app.post("/summarize", response_class=PlainTextResponse)
-async def summarize_incidents(request: SummarizeRequest):
+async def summarize_incidents(request: SummarizeRequest, stream: bool = False):
     """
     Accepts a list of incident reports and returns a Markdown summary.
     If the primary model (Gemini 2.5 Pro) quota is exhausted, it falls back
     to the Gemini 1.5 Flash model.
+    With ?stream=true, Markdown chunks are sent as the model produces them.
     """
     if not request.reports:
         raise HTTPException(status_code=400, detail="No incident reports provided.")
 
-    reports_data = [report.model_dump() for report in request.reports]
+    # Arithmetic is done here; the model only gets the aggregates and a sample
+    agg = aggregate_reports(request.reports)
+    table = render_table(agg)
+    # Most severe first; at equal severity later (newer) reports win
+    sample = pack(
+        [dict(r.model_dump(), _i=i) for i, r in enumerate(request.reports)],
+        SUMMARY_SAMPLE_TOKENS,
+        priority=lambda r: (r["severity"], r["_i"]),
+        aliases={"location": "loc", "severity": "sev", "_i": "#"},
+        label="reports",
+        max_records=SUMMARY_SAMPLE_SIZE,
+    )
+    facts = {k: agg[k] for k in ("total", "mean_severity", "max_severity", "severity_histogram", "by_type", "by_status", "top_needs")}
 
     prompt = f"""
-    You are a crisis management assistant. Your task is to summarize a list of incident reports into a concise, easy-to-read Markdown format.
+    You are a crisis management assistant. The incident statistics below were computed exactly; do not recompute or repeat them as a table.
 
-    **Incident Reports:**
-    {reports_data}
+    **Aggregates (all {agg['total']} reports):**
+    {json.dumps(facts, separators=(",", ":"))}
+
+    **Highest-priority reports ({len(sample.included)} of {agg['total']}, most severe first; pipe-separated, first line names the columns, # is the report's position in the input):**
+    {sample.text}
+    {sample.note("reports")}
 
     **Instructions:**
-    1.  Create a Markdown table summarizing the incidents by type. The table should include the count of incidents for each type and the average severity.
-    2.  Provide a brief "Overall sentiment" (e.g., Critical, High, Medium, Low).
-    3.  Write a short narrative summarizing the key needs and priorities.
-    4.  The output must be in Markdown format.
+    1.  Provide a brief "Overall sentiment" (e.g., Critical, High, Medium, Low).
+    2.  Write a short narrative summarizing the key needs and priorities.
+    3.  The output must be in Markdown format.
     """
 
+    if stream:
+        return await _streaming_response(_SharedStream(prompt), prefix=table + "\n\n")
+
+    started = time.perf_counter()
     try:
         # --- Attempt 1: Use the primary, more powerful model ---
         print(f"Attempting summary with primary model: {PRIMARY_MODEL}")
-        model = GenerativeModel(PRIMARY_MODEL)
+        model = _model(PRIMARY_MODEL)
         response = await model.generate_content_async([Part.from_text(prompt)])
-        return response.text
+        _record_timing(started, None)
+        return f"{table}\n\n{response.text}"
         
     except ResourceExhausted as e:
         # --- Attempt 2: Fallback on quota exhaustion ---
         print(f"Warning: Quota for {PRIMARY_MODEL} exhausted. Falling back to {FALLBACK_MODEL}. Error: {e}")
         try:
-            fallback_model = GenerativeModel(FALLBACK_MODEL)
+            fallback_model = _model(FALLBACK_MODEL)
             response = await fallback_model.generate_content_async([Part.from_text(prompt)])
-            return response.text
+            _record_timing(started, None)
+            return f"{table}\n\n{response.text}"
         except Exception as fallback_e:
             raise HTTPException(status_code=500, detail=f"Primary and fallback models failed. Fallback error: {fallback_e}")
             
@@ -86,43 +183,314 @@ async def summarize_incidents(request: SummarizeRequest):
     
 
 @app.get("/summarize_latest", response_class=PlainTextResponse)
-async def summarize_latest():
+async def summarize_latest(refresh: bool = False, stream: bool = False):
     """
     Fetch the latest report generated by ReportWriter from GCS and summarize it.
+    Summaries are cached per report object generation (in memory and in
+    Firestore 'summaries'), and concurrent requests for the same report share
+    one in-flight Gemini call, streamed or not: a streaming request joining a
+    running stream replays what was sent so far and follows it live. Pass
+    ?refresh=true to force a new summary and ?stream=true to receive it chunk
+    by chunk.
     """
     try:
-        db = firestore.Client(database="crisisconnect")
-        meta_doc = db.collection("metadata").document("latest_report").get()
-        if not meta_doc.exists:
-            raise HTTPException(status_code=404, detail="No latest report found in Firestore.")
-        
-        meta = meta_doc.to_dict()
-        gs_path = meta.get("report_url")
-        if not gs_path or not gs_path.startswith("gs://"):
-            raise HTTPException(status_code=400, detail="Invalid report_url in metadata.")
+        key, blob = await _latest_report()
+
+        if stream:
+            text = None if refresh else _summary_cache.get(key) or await _stored_summary(key)
+            if text is None and key in _inflight:
+                text = await asyncio.shield(_inflight[key])
+            if text is not None:
+                return StreamingResponse(iter([text]), media_type=STREAM_MEDIA_TYPE)
+            shared = _streams.get(key)
+            if shared is None:
+                shared = _SharedStream(
+                    _latest_stream_prompt(blob),
+                    on_complete=lambda text, model: _save_summary(key, blob, text, model),
+                )
+                _streams[key] = shared
+                shared.done.add_done_callback(
+                    lambda _f, key=key, shared=shared: _streams.pop(key) if _streams.get(key) is shared else None
+                )
+            return await _streaming_response(shared)
+
+        if not refresh and key in _summary_cache:
+            return _summary_cache[key]
 
-        # Parse gs://bucket/path
-        _, _, bucket_name, *path_parts = gs_path.split("/")
-        blob_name = "/".join(path_parts)
+        if key in _streams:
+            return await asyncio.shield(_streams[key].done)
 
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(blob_name)
-        content = blob.download_as_text()
+        pending = _inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(_summarize_report(key, blob, use_store=not refresh))
+            _inflight[key] = pending
+            pending.add_done_callback(lambda _f, key=key: _inflight.pop(key, None))
+        return await asyncio.shield(pending)
 
-        prompt = f"""
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to summarize latest report: {e}")
+
+
+@app.get("/stats")
+def stats():
+    """Generation timings (time to first token, total) and cache sizes."""
+    return {
+        **_timings,
+        "cached_summaries": len(_summary_cache),
+        "inflight": len(_inflight),
+        "inflight_streams": len(_streams),
+    }
+
+
+async def _latest_report():
+    """Resolve metadata/latest_report to (cache key, GCS blob)."""
+    db = _firestore()
+    meta_doc = await asyncio.to_thread(db.collection("metadata").document("latest_report").get)
+    if not meta_doc.exists:
+        raise HTTPException(status_code=404, detail="No latest report found in Firestore.")
+    
+    meta = meta_doc.to_dict()
+    gs_path = meta.get("report_url")
+    if not gs_path or not gs_path.startswith("gs://"):
+        raise HTTPException(status_code=400, detail="Invalid report_url in metadata.")
+
+    # Parse gs://bucket/path
+    _, _, bucket_name, *path_parts = gs_path.split("/")
+    blob_name = "/".join(path_parts)
+
+    # Metadata-only GET: the generation changes whenever the object is rewritten
+    blob = await asyncio.to_thread(_storage().bucket(bucket_name).get_blob, blob_name)
+    if blob is None:
+        raise HTTPException(status_code=404, detail=f"Report object {gs_path} not found.")
+    return f"{gs_path}#{blob.generation}#{SUMMARY_PROMPT_VERSION}", blob
+
+
+def _latest_prompt(content: str) -> str:
+    return f"""
         Summarize the following Markdown situation report into a short Markdown summary.
         Keep only key statistics, affected regions, and top 3 priorities.
 
-        {content[:120000]}
+        {content}
         """
 
-        model = GenerativeModel(PRIMARY_MODEL)
-        response = await model.generate_content_async([Part.from_text(prompt)])
-        return response.text
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to summarize latest report: {e}")
+async def _latest_stream_prompt(blob) -> str:
+    return _latest_prompt(await _condensed_report(blob))
+
+
+async def _condensed_report(blob) -> str:
+    """
+    Report text that fits one prompt: unchanged when small enough, otherwise
+    map-reduced section by section instead of being cut off.
+    """
+    content = await asyncio.to_thread(blob.download_as_text)
+    if len(content) <= REPORT_MAX_PROMPT_CHARS:
+        return content
+    chunks = split_markdown(content, REPORT_CHUNK_CHARS)
+
+    mr = MapReduceSummarizer(
+        lambda prompt: _model(PRIMARY_MODEL).generate_content(prompt).text,
+        MAP_PROMPT,
+        REDUCE_PROMPT,
+        max_chars=REPORT_MAX_PROMPT_CHARS,
+        workers=REPORT_WORKERS,
+        cache=FirestoreChunkCache(_firestore()),
+    )
+    condensed = await asyncio.to_thread(mr.condense, chunks)
+    print(f"Map-reduce over {len(chunks)} report sections: {mr.stats()}")
+    return condensed
+
+
+def _summary_doc(key: str):
+    return _firestore().collection("summaries").document(hashlib.sha256(key.encode()).hexdigest())
+
+
+async def _stored_summary(key: str) -> Optional[str]:
+    snap = await asyncio.to_thread(_summary_doc(key).get)
+    text = (snap.to_dict() or {}).get("text") if snap.exists else None
+    if text:
+        _remember_summary(key, text)
+    return text
+
+
+async def _save_summary(key: str, blob, text: str, model: str) -> None:
+    _remember_summary(key, text)
+    await asyncio.to_thread(_summary_doc(key).set, {
+        "key": key,
+        "report_url": key.split("#", 1)[0],
+        "generation": blob.generation,
+        "model": model,
+        "text": text,
+        "created_at": firestore.SERVER_TIMESTAMP,
+    })
+
+
+async def _summarize_report(key: str, blob, use_store: bool = True) -> str:
+    """Persisted summary for `key` if there is one, else download and summarize."""
+    if use_store:
+        text = await _stored_summary(key)
+        if text:
+            return text
+
+    content = await _condensed_report(blob)
+
+    started = time.perf_counter()
+    response = await _model(PRIMARY_MODEL).generate_content_async([Part.from_text(_latest_prompt(content))])
+    _record_timing(started, None)
+    text = response.text
+
+    await _save_summary(key, blob, text, PRIMARY_MODEL)
+    return text
+
+
+def _remember_summary(key: str, text: str) -> None:
+    _summary_cache[key] = text
+    while len(_summary_cache) > SUMMARY_CACHE_ITEMS:
+        _summary_cache.pop(next(iter(_summary_cache)))
+
+
+# --- Streaming ---
+
+async def _open_stream(prompt: str):
+    """
+    Start a streamed generation and wait for its first chunk, falling back to
+    FALLBACK_MODEL if the primary quota is exhausted before anything arrives.
+    Returns (model name, first chunk text, async iterator over the rest).
+    """
+    parts = [Part.from_text(prompt)]
+    for name in (PRIMARY_MODEL, FALLBACK_MODEL):
+        try:
+            responses = await _model(name).generate_content_async(parts, stream=True)
+            it = responses.__aiter__()
+            try:
+                first = await it.__anext__()
+            except StopAsyncIteration:
+                return name, "", None
+            return name, _chunk_text(first), it
+        except ResourceExhausted as e:
+            if name == FALLBACK_MODEL:
+                raise HTTPException(status_code=500, detail=f"Primary and fallback models failed. Fallback error: {e}")
+            print(f"Warning: Quota for {PRIMARY_MODEL} exhausted. Falling back to {FALLBACK_MODEL}. Error: {e}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred with {name}: {e}")
+
+
+class _SharedStream:
+    """
+    One streamed generation relayed to every request that joins it. Chunks are
+    kept, so a late joiner replays them before following the live stream, and
+    the generation runs to the end even if its first client disconnects.
+    `opened` resolves to the model name once the first chunk is in (or fails
+    as _open_stream does); `done` resolves to the full text.
+    on_complete(text, model) runs after the stream finishes cleanly.
+    """
+
+    def __init__(self, prompt, on_complete=None):
+        loop = asyncio.get_running_loop()
+        self.chunks: List[str] = []
+        self.error: Optional[Exception] = None
+        self.opened = loop.create_future()
+        self.done = loop.create_future()
+        for future in (self.opened, self.done):
+            # Joiners may all be gone; don't log the exception as unretrieved
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._changed = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run(prompt, on_complete))
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _push(self, text: str) -> None:
+        if text:
+            self.chunks.append(text)
+            self._wake()
+
+    async def _run(self, prompt, on_complete) -> None:
+        started = time.perf_counter()
+        try:
+            if not isinstance(prompt, str):
+                prompt = await prompt
+            name, first, it = await _open_stream(prompt)
+        except Exception as e:
+            self.opened.set_exception(e)
+            self.done.set_exception(e)
+            self._wake()
+            return
+        first_at = time.perf_counter()
+        self.opened.set_result(name)
+        self._push(first)
+
+        try:
+            while it is not None:
+                try:
+                    chunk = await it.__anext__()
+                except StopAsyncIteration:
+                    break
+                self._push(_chunk_text(chunk))
+        except Exception as e:
+            self.error = e
+            self.done.set_exception(e)
+            self._wake()
+            return
+
+        _record_timing(started, first_at)
+        text = "".join(self.chunks)
+        try:
+            if on_complete is not None:
+                await on_complete(text, name)
+        finally:
+            self.done.set_result(text)
+            self._wake()
+
+    async def relay(self, prefix: str = ""):
+        if prefix:
+            yield prefix
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done.done():
+                break
+            await self._changed.wait()
+        if self.error is not None:
+            yield f"\n\n_[generation interrupted: {self.error}]_\n"
+
+
+async def _streaming_response(shared: _SharedStream, prefix: str = "") -> StreamingResponse:
+    """
+    StreamingResponse relaying `shared` after an optional locally rendered
+    prefix. Errors before the first chunk become normal HTTP errors; after
+    that the stream ends with a note.
+    """
+    name = await asyncio.shield(shared.opened)
+    return StreamingResponse(shared.relay(prefix), media_type=STREAM_MEDIA_TYPE, headers={"X-Model": name})
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text or ""
+    except Exception:
+        # Chunks without text parts (e.g. safety metadata only)
+        return ""
+
+
+def _record_timing(started: float, first_at: Optional[float]) -> None:
+    now = time.perf_counter()
+    total_ms = (now - started) * 1000
+    ttft_ms = ((first_at or now) - started) * 1000
+    n = _timings["generations"] = _timings["generations"] + 1
+    _timings["streamed"] += first_at is not None
+    _timings["last_ttft_ms"] = round(ttft_ms, 1)
+    _timings["last_total_ms"] = round(total_ms, 1)
+    _timings["avg_ttft_ms"] = round(_timings["avg_ttft_ms"] + (ttft_ms - _timings["avg_ttft_ms"]) / n, 1)
+    _timings["avg_total_ms"] = round(_timings["avg_total_ms"] + (total_ms - _timings["avg_total_ms"]) / n, 1)
+    print(f"Generation finished: ttft={ttft_ms:.0f}ms total={total_ms:.0f}ms streamed={first_at is not None}")
 
 
 @app.get("/")
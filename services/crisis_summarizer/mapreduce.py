@@ -0,0 +1,149 @@
+# Chunked map-reduce summarization for inputs too big for one prompt.
+# Input is split on record/section boundaries, chunks are summarized on a
+# bounded worker pool (with per-chunk caching), and partial summaries are
+# merged in rounds until they fit into a single final prompt.
+# Kept identical in jobs/reportwriter and services/crisis_summarizer.
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import hashlib
+import json
+import re
+import threading
+
+_HEADING = re.compile(r"(?m)^(?=#{1,3} )")
+
+
+def split_records(records: Iterable[Any], max_chars: int, header: str = "") -> List[str]:
+    """
+    Pack records as JSON lines into chunks of at most ~max_chars, never
+    splitting a record. Each chunk starts with `header`.
+    """
+    chunks, current, size = [], [], len(header)
+    for rec in records:
+        line = json.dumps(rec, separators=(",", ":"), ensure_ascii=False, default=str)
+        if current and size + len(line) + 1 > max_chars:
+            chunks.append(header + "\n".join(current))
+            current, size = [], len(header)
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append(header + "\n".join(current))
+    return chunks
+
+
+def split_markdown(text: str, max_chars: int) -> List[str]:
+    """
+    Split Markdown on headings, then blank lines, then lines, so that each
+    chunk is at most max_chars and no section is cut mid-line.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    pieces: List[str] = []
+    for section in _HEADING.split(text):
+        if len(section) <= max_chars:
+            pieces.append(section)
+            continue
+        for para in re.split(r"(?<=\n)\n", section):
+            if len(para) <= max_chars:
+                pieces.append(para)
+                continue
+            # Oversized paragraph: fall back to line boundaries (and hard cuts for huge lines)
+            for line in para.splitlines(keepends=True):
+                pieces.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+
+    chunks, current = [], ""
+    for p in pieces:
+        if current and len(current) + len(p) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += p
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class MapReduceSummarizer:
+    """
+    condense(chunks) -> text small enough for one final prompt.
+
+    generate(prompt) -> str is the model call. map_prompt and reduce_prompt
+    contain a {content} placeholder (plain replace, so JSON braces are safe).
+    Per-chunk results are cached by prompt hash in `cache` (any mapping).
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str], str],
+        map_prompt: str,
+        reduce_prompt: str,
+        max_chars: int = 100_000,
+        fan_in: int = 8,
+        workers: int = 4,
+        cache: Optional[Any] = None,
+    ):
+        self.generate = generate
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.max_chars = max_chars
+        self.fan_in = max(2, fan_in)
+        self.workers = max(1, workers)
+        self.cache = cache if cache is not None else {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cache_hits = 0
+
+    def condense(self, chunks: List[str]) -> str:
+        if len(chunks) <= 1:
+            return chunks[0] if chunks else ""
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            partials = list(pool.map(lambda c: self._run(self.map_prompt, c), chunks))
+            # Merge rounds: each round cuts the count by fan_in, so depth is log(n)
+            while len(partials) > 1 and len(self._join(partials)) > self.max_chars:
+                groups = [partials[i:i + self.fan_in] for i in range(0, len(partials), self.fan_in)]
+                partials = list(pool.map(lambda g: self._run(self.reduce_prompt, self._join(g)), groups))
+        return self._join(partials)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "cache_hits": self.cache_hits}
+
+    # ---------- helpers ----------
+
+    @staticmethod
+    def _join(parts: List[str]) -> str:
+        return "\n\n---\n\n".join(parts)
+
+    def _run(self, template: str, content: str) -> str:
+        prompt = template.replace("{content}", content)
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        try:
+            hit = self.cache.get(key)
+        except Exception:
+            hit = None
+        if hit:
+            with self._lock:
+                self.cache_hits += 1
+            return hit
+        text = self.generate(prompt)
+        with self._lock:
+            self.calls += 1
+        try:
+            self.cache[key] = text
+        except Exception:
+            pass
+        return text
+
+
+class FirestoreChunkCache:
+    """Mapping-style chunk cache persisted in a Firestore collection."""
+
+    def __init__(self, db, collection: str = "summary_chunks"):
+        self.col = db.collection(collection)
+
+    def get(self, key: str) -> Optional[str]:
+        snap = self.col.document(key).get()
+        return (snap.to_dict() or {}).get("text") if snap.exists else None
+
+    def __setitem__(self, key: str, text: str) -> None:
+        self.col.document(key).set({"text": text})
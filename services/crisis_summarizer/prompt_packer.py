@@ -0,0 +1,144 @@
+# Token-budget prompt packing.
+# Records are compacted (empty fields dropped, timestamps shortened, long text
+# capped), encoded as one pipe-separated table with short column names, and
+# added in priority order until the token budget is used up. What did not fit
+# is returned so callers can say so (or condense it separately).
+# Kept identical in jobs/reportwriter and services/crisis_summarizer.
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap tokenizer-free estimate: one token per punctuation mark and per word,
+    plus one per 6 characters of long words. Errs slightly high for prose.
+    """
+    return sum(1 + len(t) // 6 for t in _TOKEN.findall(text))
+
+
+def _scalar(value: Any, max_chars: int) -> Any:
+    if hasattr(value, "isoformat"):
+        # Minutes are plenty for a situation report
+        return value.isoformat()[:16]
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        return value if len(value) <= max_chars else value[: max_chars - 1] + "…"
+    return value
+
+
+def compact(record: Dict[str, Any], aliases: Optional[Dict[str, str]] = None, max_chars: int = 300) -> Dict[str, Any]:
+    """
+    Flat, short-keyed copy of `record` without empty values. Lists become
+    ';'-joined strings and nested dicts are skipped unless aliased as 'a.b'.
+    """
+    aliases = aliases or {}
+    out: Dict[str, Any] = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            for sub, v in value.items():
+                name = aliases.get(f"{key}.{sub}")
+                if name and v not in (None, "", [], {}):
+                    out.setdefault(name, _scalar(v, max_chars))
+            continue
+        if value in (None, "", [], {}):
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ";".join(str(_scalar(v, max_chars)) for v in value if v not in (None, ""))
+            if not value:
+                continue
+        out[aliases.get(key, key)] = _scalar(value, max_chars)
+    return out
+
+
+def _cell(value: Any) -> str:
+    return "" if value is None else str(value).replace("|", "/").replace("\n", " ")
+
+
+def encode_table(rows: Sequence[Dict[str, Any]], columns: Sequence[str], label: str = "") -> str:
+    header = f"[{label}] " if label else ""
+    lines = [header + "|".join(columns)]
+    lines += ["|".join(_cell(r.get(c)) for c in columns) for r in rows]
+    return "\n".join(lines)
+
+
+class PackResult(NamedTuple):
+    text: str
+    tokens: int
+    included: List[Dict[str, Any]]
+    omitted: List[Dict[str, Any]]
+
+    def note(self, label: str = "records") -> str:
+        """One line for the prompt about what was left out ('' if nothing)."""
+        if not self.omitted:
+            return ""
+        total = len(self.included) + len(self.omitted)
+        return f"({len(self.omitted)} of {total} {label} not listed; all are lower priority than those shown.)"
+
+
+def _columns(rows: Sequence[Dict[str, Any]]) -> List[str]:
+    # First-seen order, so the most important records shape the header
+    columns: Dict[str, None] = {}
+    for r in rows:
+        columns.update(dict.fromkeys(r))
+    return list(columns)
+
+
+def _fill(rows, cols, label, budget_tokens, start=0, max_records=None, min_records=0):
+    """Table of rows[start:end] within budget; returns (text, tokens, end)."""
+    header = encode_table([], cols, label)
+    used = estimate_tokens(header)
+    lines = [header]
+    end = start
+    while end < len(rows):
+        if max_records is not None and end - start >= max_records:
+            break
+        line = "|".join(_cell(rows[end].get(c)) for c in cols)
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget_tokens and end - start >= min_records:
+            break
+        lines.append(line)
+        used += cost
+        end += 1
+    return "\n".join(lines), used, end
+
+
+def pack(
+    records: Sequence[Dict[str, Any]],
+    budget_tokens: int,
+    priority: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    aliases: Optional[Dict[str, str]] = None,
+    label: str = "",
+    max_records: Optional[int] = None,
+    max_chars: int = 300,
+) -> PackResult:
+    """
+    Highest-priority records (largest priority(record) first; input order
+    otherwise) encoded as a table of at most budget_tokens.
+    included/omitted hold the original records.
+    """
+    order = sorted(records, key=priority, reverse=True) if priority else list(records)
+    rows = [compact(r, aliases, max_chars) for r in order]
+    text, used, n = _fill(rows, _columns(rows), label, budget_tokens, max_records=max_records)
+    return PackResult(text, used, order[:n], order[n:])
+
+
+def pack_chunks(
+    records: Sequence[Dict[str, Any]],
+    budget_tokens: int,
+    aliases: Optional[Dict[str, str]] = None,
+    label: str = "",
+    max_chars: int = 300,
+) -> List[str]:
+    """
+    Every record, in order, split into tables of at most ~budget_tokens each
+    (for map-reduce). A single record above the budget gets a chunk of its own.
+    """
+    rows = [compact(r, aliases, max_chars) for r in records]
+    cols = _columns(rows)
+    chunks, start = [], 0
+    while start < len(rows):
+        text, _, start = _fill(rows, cols, label, budget_tokens, start=start, min_records=1)
+        chunks.append(text)
+    return chunks
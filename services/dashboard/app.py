@@ -1,10 +1,17 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from google.cloud import firestore
 from datetime import datetime
-import httpx, os
+from typing import Any, Dict, List, Optional, Tuple
+from ttl_cache import TTLCache
+from live import ChangeHub, FirestoreChangeSource, sse_format
+from tasks import TaskTracker
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import base64, httpx, json, os
 
 app = FastAPI(title="CrisisConnect Dashboard")
 db = firestore.Client(database="crisisconnect")
@@ -13,31 +20,198 @@ db = firestore.Client(database="crisisconnect")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+# Short-TTL cache for the home page and the docs it reads
+cache = TTLCache(ttl_seconds=float(os.getenv("DASHBOARD_CACHE_TTL", "5")))
+
+# Match feed paging and the only match fields the template renders
+MATCH_PAGE_SIZE = int(os.getenv("MATCH_PAGE_SIZE", "20"))
+MATCH_PAGE_MAX = 100
+MATCH_FIELDS = ["incident.location", "incident.summary", "matches", "ngos", "created_at"]
+
+# One shared Firestore listener fans match/summary deltas out to SSE clients
+hub = ChangeHub(
+    FirestoreChangeSource(db),
+    buffer=int(os.getenv("SSE_CLIENT_BUFFER", "100")),
+    on_change=lambda event: cache.invalidate(),
+)
+SSE_KEEPALIVE_SECONDS = 15
+
+# The Firestore client is synchronous; run its calls on a bounded pool
+_fs_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FIRESTORE_THREADS", "8")), thread_name_prefix="firestore"
+)
+
+# Downstream triggers run in the background; see /tasks/<id>
+tasks = TaskTracker()
+http: Optional[httpx.AsyncClient] = None
+
 # --- Environment variables ---
 DATASCOUT_URL = os.getenv("DATASCOUT_URL")
 RESOURCEPLANNER_URL = os.getenv("RESOURCEPLANNER_URL")
 CRISISSUMMARIZER_URL = os.getenv("CRISISSUMMARIZER_URL")
 
-@app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
-    report = db.collection("metadata").document("latest_report").get().to_dict() or {}
+
+async def _fs(fn, *args, **kwargs):
+    """Run a blocking Firestore call off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_fs_pool, partial(fn, *args, **kwargs))
+
+
+@app.on_event("startup")
+async def _open_http_client():
+    global http
+    # One pooled client for the app's lifetime; per-call timeouts below
+    http = httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    )
+
+
+def _encode_cursor(snap) -> Optional[str]:
+    created_at = snap.get("created_at")
+    if created_at is None:
+        return None
+    raw = json.dumps({"t": created_at.isoformat(), "id": snap.id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(token: str) -> Optional[Dict[str, Any]]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        return {"created_at": datetime.fromisoformat(data["t"]), "__name__": data["id"]}
+    except Exception:
+        return None
+
+
+async def _load_report() -> Dict[str, Any]:
+    snap = await _fs(db.collection("metadata").document("latest_report").get)
+    report = snap.to_dict() or {}
     if report.get("report_url", "").startswith("gs://"):
         _, _, bucket, *path = report["report_url"].split("/")
         blob_name = "/".join(path)
         report["report_url"] = f"https://storage.googleapis.com/{bucket}/{blob_name}"
+    return report
+
+
+async def _load_summary() -> Dict[str, Any]:
+    snap = await _fs(db.collection("summary").document("current").get)
+    return snap.to_dict() or {}
+
 
-    matches = [d.to_dict() for d in db.collection("matches").stream()]
-    summary_doc = db.collection("summary").document("current").get().to_dict() or {}
-
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "matches": matches,
-            "report": report,
-            "summary": summary_doc.get("text", ""),
-        },
+async def _load_matches(limit: int, cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of matches, newest first, projected to the fields index.html renders.
+    Returns (matches, next cursor token or None).
+    """
+    q = (
+        db.collection("matches")
+        .select(MATCH_FIELDS)
+        .order_by("created_at", direction=firestore.Query.DESCENDING)
+        .order_by("__name__", direction=firestore.Query.DESCENDING)
     )
+    start = _decode_cursor(cursor) if cursor else None
+    if start:
+        q = q.start_after(start)
+    docs = await _fs(lambda: list(q.limit(limit + 1).stream()))
+    page, more = docs[:limit], len(docs) > limit
+    next_cursor = _encode_cursor(page[-1]) if more and page else None
+    return [{**(d.to_dict() or {}), "id": d.id} for d in page], next_cursor
+
+
+@app.get("/", response_class=HTMLResponse)
+async def home(request: Request, cursor: Optional[str] = None, limit: int = MATCH_PAGE_SIZE):
+    limit = max(1, min(limit, MATCH_PAGE_MAX))
+
+    async def render() -> str:
+        report = await cache.get_or_load("report", _load_report)
+        summary_doc = await cache.get_or_load("summary", _load_summary)
+        matches, next_cursor = await cache.get_or_load(
+            ("matches", limit, cursor), lambda: _load_matches(limit, cursor)
+        )
+        return templates.get_template("index.html").render(
+            request=request,
+            matches=matches,
+            report=report,
+            summary=summary_doc.get("text", ""),
+            next_cursor=next_cursor,
+            cursor=cursor,
+            limit=limit,
+        )
+
+    # Rendered pages are shared by every coordinator hitting the same page
+    return HTMLResponse(await cache.get_or_load(("page", limit, cursor), render))
+
+
+@app.get("/events")
+async def events(request: Request):
+    """Server-Sent Events stream of new matches and summary updates."""
+    sub = hub.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_format(event)
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/tasks")
+async def list_tasks():
+    return {"tasks": tasks.recent()}
+
+
+@app.get("/tasks/{task_id}")
+async def task_status(task_id: str):
+    info = tasks.get(task_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Unknown task")
+    return info
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    hub.stop()
+    await tasks.shutdown()
+    if http is not None:
+        await http.aclose()
+    _fs_pool.shutdown(wait=False)
+
+
+async def _invoke(base_url: Optional[str], action: str, payload: Dict[str, Any], timeout: Optional[float]):
+    if not base_url:
+        raise RuntimeError(f"No URL configured for {action}")
+    resp = await http.post(f"{base_url.rstrip('/')}/invoke/{action}", json=payload, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def _refresh_pipeline():
+    ingest = await _invoke(DATASCOUT_URL, "ingest_from_transcripts", {"limit": 5}, timeout=300.0)
+    plan = await _invoke(RESOURCEPLANNER_URL, "plan_unmatched_incidents", {"limit": 50}, timeout=300.0)
+    return {"ingest": ingest, "plan": plan}
+
+
+async def _refresh_summary():
+    resp = await http.get(f"{CRISISSUMMARIZER_URL}/summarize_latest", timeout=None)
+    resp.raise_for_status()
+    await _fs(db.collection("summary").document("current").set, {
+        "text": resp.text,
+        "updated_at": datetime.utcnow().isoformat()
+    })
+    cache.invalidate()
+    return {"chars": len(resp.text)}
 
 
 @app.post("/report-incident")
@@ -52,31 +226,53 @@ async def report_incident(
         "needs": [n.strip() for n in needs.split(",") if n.strip()],
         "timestamp": datetime.utcnow().isoformat(),
     }
-    db.collection("incidents").document().set(incident)
+    ref = db.collection("incidents").document()
+    # created_at is what the planner's sweep and the ReportWriter order by
+    await _fs(ref.set, {**incident, "created_at": firestore.SERVER_TIMESTAMP})
+    cache.invalidate()
 
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        await client.post(f"{RESOURCEPLANNER_URL}/match")
-
-    return RedirectResponse("/", status_code=303)
+    # Plan this incident directly; idempotent by incident_id
+    task_id = tasks.start(
+        "plan",
+        _invoke(RESOURCEPLANNER_URL, "plan_matches", {"incident": incident, "incident_id": ref.id}, timeout=300.0),
+    )
+    return RedirectResponse(f"/?task={task_id}", status_code=303)
 
 
 @app.get("/update-summary")
 async def update_summary():
-    """Call CrisisSummarizer to summarize the latest report."""
-    async with httpx.AsyncClient(timeout=None) as client:
-        resp = await client.get(f"{CRISISSUMMARIZER_URL}/summarize_latest")
-        summary_text = resp.text
+    """Call CrisisSummarizer to summarize the latest report (in the background)."""
+    task_id = tasks.start("update-summary", _refresh_summary())
+    return RedirectResponse(f"/?task={task_id}", status_code=303)
 
-    db.collection("summary").document("current").set({
-        "text": summary_text,
-        "updated_at": datetime.utcnow().isoformat()
-    })
-    return RedirectResponse("/", status_code=303)
+@app.get("/update-summary/stream")
+async def update_summary_stream():
+    """Relay CrisisSummarizer's streamed summary to the browser, then save it."""
+    req = http.build_request("GET", f"{CRISISSUMMARIZER_URL}/summarize_latest", params={"stream": "true"}, timeout=None)
+    resp = await http.send(req, stream=True)
+    if resp.status_code // 100 != 2:
+        detail = (await resp.aread()).decode(errors="replace")
+        await resp.aclose()
+        raise HTTPException(status_code=502, detail=f"CrisisSummarizer returned {resp.status_code}: {detail}")
+
+    async def relay():
+        chunks = []
+        try:
+            async for chunk in resp.aiter_text():
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await resp.aclose()
+        await _fs(db.collection("summary").document("current").set, {
+            "text": "".join(chunks),
+            "updated_at": datetime.utcnow().isoformat()
+        })
+        cache.invalidate()
+
+    return StreamingResponse(relay(), media_type=resp.headers.get("content-type", "text/plain"))
 
 @app.get("/refresh")
 async def refresh():
-    """Trigger DataScout & ResourcePlanner to reprocess recent data."""
-    async with httpx.AsyncClient() as client:
-        await client.post(f"{DATASCOUT_URL}/ingest/from_transcripts", json={"limit": 5})
-        await client.post(f"{RESOURCEPLANNER_URL}/match")
-    return RedirectResponse("/", status_code=303)
+    """Trigger DataScout & ResourcePlanner to reprocess recent data (in the background)."""
+    task_id = tasks.start("refresh", _refresh_pipeline())
+    return RedirectResponse(f"/?task={task_id}", status_code=303)
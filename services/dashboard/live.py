@@ -0,0 +1,141 @@
+# Live updates for the dashboard: one shared change source fans deltas out to
+# every connected browser. Each client gets a bounded buffer; a client that
+# falls behind has its backlog dropped and is told to resync instead.
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+RESYNC = {"type": "resync"}
+
+
+def match_event(doc_id: str, data: Dict[str, Any], kind: str) -> Dict[str, Any]:
+    """Delta for one match, trimmed to what the page renders."""
+    incident = data.get("incident") or {}
+    ngos = data.get("matches") or data.get("ngos") or []
+    return {
+        "type": "match",
+        "change": kind,
+        "id": doc_id,
+        "location": incident.get("location", "?"),
+        "summary": incident.get("summary", ""),
+        "ngos": [n.get("name", "(unknown)") for n in ngos if isinstance(n, dict)],
+    }
+
+
+class FirestoreChangeSource:
+    """
+    Watches matches created after start-up plus summary/current, and calls
+    publish(event) from the listener thread for each change. The summary's
+    initial snapshot is the page's current state, not a change, so it is skipped.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._watches: List[Any] = []
+
+    def start(self, publish: Callable[[Dict[str, Any]], None]) -> None:
+        since = datetime.now(timezone.utc)
+
+        def on_matches(docs, changes, read_time):
+            for ch in changes:
+                kind = ch.type.name.lower()
+                publish(match_event(ch.document.id, ch.document.to_dict() or {}, kind))
+
+        initial = [True]
+
+        def on_summary(docs, changes, read_time):
+            if initial[0]:
+                initial[0] = False
+                return
+            for d in docs:
+                publish({"type": "summary", "text": (d.to_dict() or {}).get("text", "")})
+
+        self._watches = [
+            self.db.collection("matches").where("created_at", ">", since).on_snapshot(on_matches),
+            self.db.collection("summary").document("current").on_snapshot(on_summary),
+        ]
+
+    def stop(self) -> None:
+        for w in self._watches:
+            try:
+                w.unsubscribe()
+            except Exception:
+                pass
+        self._watches = []
+
+
+class Subscriber:
+    def __init__(self, buffer: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        self.dropped = 0
+
+
+class ChangeHub:
+    """
+    Fan-out from one change source to many async subscribers. The source is
+    started with the first subscriber and stopped when the last one leaves,
+    so idle instances hold no listeners.
+    """
+
+    def __init__(self, source, buffer: int = 100, on_change: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.source = source
+        self.buffer = max(2, buffer)
+        self.on_change = on_change
+        self._subs: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started = False
+
+        # counters
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self) -> Subscriber:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscriber(self.buffer)
+        self._subs.add(sub)
+        if not self._started:
+            self.source.start(self.publish_threadsafe)
+            self._started = True
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subs.discard(sub)
+        if not self._subs:
+            self.stop()
+
+    def publish_threadsafe(self, event: Dict[str, Any]) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.publish, event)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.published += 1
+        if self.on_change is not None:
+            self.on_change(event)
+        for sub in list(self._subs):
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow client: drop its backlog, tell it to reload instead
+                sub.dropped += sub.queue.qsize()
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(RESYNC)
+                self.resyncs += 1
+
+    def stop(self) -> None:
+        if self._started:
+            self.source.stop()
+            self._started = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._subs),
+            "published": self.published,
+            "resyncs": self.resyncs,
+            "listening": self._started,
+        }
+
+
+def sse_format(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -0,0 +1,66 @@
+# Tracked background tasks for downstream triggers (planner, summarizer,
+# DataScout). Handlers return immediately; status is looked up by task id.
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, List, Optional
+
+
+class TaskTracker:
+    def __init__(self, keep: int = 200):
+        self.keep = keep
+        self._tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, coro: Awaitable[Any]) -> str:
+        task_id = uuid.uuid4().hex[:12]
+        self._tasks[task_id] = {
+            "id": task_id,
+            "name": name,
+            "status": "running",
+            "started_at": time.time(),
+            "finished_at": None,
+            "error": None,
+            "result": None,
+        }
+        task = asyncio.create_task(self._run(task_id, coro))
+        self._running[task_id] = task  # keep a reference until it finishes
+        self._prune()
+        return task_id
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        info = self._tasks.get(task_id)
+        return dict(info) if info else None
+
+    def recent(self, n: int = 20) -> List[Dict[str, Any]]:
+        return [dict(t) for t in list(self._tasks.values())[-n:]][::-1]
+
+    async def shutdown(self, timeout: float = 10.0) -> None:
+        pending = list(self._running.values())
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        for t in self._running.values():
+            t.cancel()
+
+    async def _run(self, task_id: str, coro: Awaitable[Any]) -> None:
+        info = self._tasks[task_id]
+        try:
+            info["result"] = await coro
+            info["status"] = "done"
+        except asyncio.CancelledError:
+            info["status"] = "cancelled"
+            raise
+        except Exception as e:
+            info["status"] = "failed"
+            info["error"] = str(e) or type(e).__name__
+        finally:
+            info["finished_at"] = time.time()
+            self._running.pop(task_id, None)
+
+    def _prune(self) -> None:
+        while len(self._tasks) > self.keep:
+            oldest = next(iter(self._tasks))
+            if oldest in self._running:
+                break
+            del self._tasks[oldest]
@@ -0,0 +1,75 @@
+# Short-TTL in-process cache with single-flight loading: concurrent requests
+# for the same missing key wait on one loader instead of each hitting Firestore.
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float = 5.0, max_items: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._data.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            self.hits += 1
+            return entry[1]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = await loader()
+        except BaseException as e:
+            if isinstance(e, Exception):
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved when nobody else is waiting
+            else:
+                fut.cancel()
+            raise
+        else:
+            self._put(key, value)
+            fut.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Drop the given keys, or everything when called without keys."""
+        if not keys:
+            self._data.clear()
+            return
+        for k in keys:
+            self._data.pop(k, None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "items": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / total, 4) if total else 0.0,
+        }
+
+    def _put(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic(), value)
+        if len(self._data) > self.max_items:
+            now = time.monotonic()
+            for k in [k for k, (t, _) in self._data.items() if now - t >= self.ttl_seconds]:
+                del self._data[k]
+            while len(self._data) > self.max_items:
+                del self._data[next(iter(self._data))]
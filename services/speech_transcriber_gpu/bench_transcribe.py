@@ -0,0 +1,100 @@
+# Real-time factor and peak memory per transcription configuration.
+#
+#   python bench_transcribe.py fixtures/*.wav \
+#       --config small:int8:seq:8 --config small:int8:4x2 --config medium:int8:4x2
+#
+# A config is MODEL:COMPUTE:MODE where MODE is "seq:<threads>" (one pass over
+# the whole file, like the GPU path) or "<spans>x<threads>" (VAD-split spans
+# transcribed <spans> at a time, <threads> cores each). Every config runs in
+# its own process so peak RSS is not shared between them.
+# RTF = processing seconds / audio seconds (lower is better; < 1 is faster than real time).
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+
+def _parse(config):
+    size, compute, mode, *rest = config.split(":")
+    if mode == "seq":
+        return size, compute, 1, int(rest[0]) if rest else os.cpu_count() or 1, False
+    spans, threads = (int(x) for x in mode.split("x"))
+    return size, compute, spans, threads, True
+
+
+def run_one(config, files):
+    from faster_whisper import WhisperModel
+    from faster_whisper.audio import decode_audio
+    from cpu_transcribe import SAMPLE_RATE, transcribe_parallel
+
+    size, compute, spans, threads, parallel = _parse(config)
+    t = time.perf_counter()
+    model = WhisperModel(size, device="cpu", compute_type=compute, cpu_threads=threads, num_workers=spans)
+    load_s = time.perf_counter() - t
+
+    audio_s = busy_s = 0.0
+    words = 0
+    for path in files:
+        audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+        t = time.perf_counter()
+        if parallel:
+            segments, _ = transcribe_parallel(model, audio, parallel=spans)
+            text = " ".join(s["text"] for s in segments)
+        else:
+            segments, _ = model.transcribe(audio)
+            text = " ".join(s.text for s in segments)
+        busy_s += time.perf_counter() - t
+        audio_s += len(audio) / SAMPLE_RATE
+        words += len(text.split())
+
+    return {
+        "config": config,
+        "files": len(files),
+        "audio_s": round(audio_s, 1),
+        "load_s": round(load_s, 1),
+        "transcribe_s": round(busy_s, 1),
+        "rtf": round(busy_s / audio_s, 3) if audio_s else None,
+        "words": words,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("files", nargs="+", help="local fixture audio files")
+    ap.add_argument("--config", action="append", help="MODEL:COMPUTE:MODE (repeatable)")
+    ap.add_argument("--single", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.single:
+        print(json.dumps(run_one(args.single, args.files)))
+        return
+
+    cores = os.cpu_count() or 1
+    configs = args.config or [f"small:int8:seq:{cores}", f"small:int8:{max(1, cores // 2)}x2"]
+    rows = []
+    for config in configs:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", config, *args.files],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            rows.append({"config": config, "error": out.stderr.strip().splitlines()[-1:]})
+        else:
+            rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        print(json.dumps(rows[-1]), flush=True)
+
+    print(f"\n{'config':<24} {'audio_s':>8} {'rtf':>7} {'peak_rss_mb':>12} {'words':>7}")
+    for r in rows:
+        if "error" in r:
+            print(f"{r['config']:<24} error: {r['error']}")
+            continue
+        print(f"{r['config']:<24} {r['audio_s']:>8} {r['rtf']:>7} {r['peak_rss_mb']:>12} {r['words']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# CPU throughput mode: split audio on voice activity, transcribe the speech
+# spans concurrently on one int8 model (num_workers > 1 lets CTranslate2 run
+# several transcribe calls at once), then stitch segments in timestamp order.
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+SAMPLE_RATE = 16000
+
+
+def speech_spans(
+    audio: np.ndarray,
+    max_span_s: float = 30.0,
+    min_silence_ms: int = 500,
+    pad_ms: int = 200,
+) -> List[Tuple[int, int]]:
+    """
+    (start, end) sample ranges covering the speech in `audio`. Neighbouring
+    speech chunks are merged up to max_span_s (Whisper's window), so each
+    span has enough context without dragging silence along.
+    """
+    chunks = get_speech_timestamps(
+        audio,
+        VadOptions(
+            min_silence_duration_ms=min_silence_ms,
+            speech_pad_ms=pad_ms,
+            max_speech_duration_s=max_span_s,
+        ),
+    )
+    limit = int(max_span_s * SAMPLE_RATE)
+    spans: List[Tuple[int, int]] = []
+    for c in chunks:
+        start, end = int(c["start"]), int(c["end"])
+        if spans and end - spans[-1][0] <= limit:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def _run_span(model, audio: np.ndarray, span: Tuple[int, int], options: Dict[str, Any]):
+    start, end = span
+    segments, info = model.transcribe(audio[start:end], vad_filter=False, **options)
+    offset = start / SAMPLE_RATE
+    out = [
+        {"start": round(s.start + offset, 2), "end": round(s.end + offset, 2), "text": s.text.strip()}
+        for s in segments
+    ]
+    return out, info.language
+
+
+def transcribe_parallel(
+    model,
+    audio: np.ndarray,
+    parallel: int = 2,
+    language: Optional[str] = None,
+    max_span_s: float = 30.0,
+    **options: Any,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Returns (segments sorted by start time, {"language", "duration", "spans"}).
+    Without `language`, it is detected on the first span and reused for the
+    rest so every span is decoded consistently.
+    """
+    spans = speech_spans(audio, max_span_s=max_span_s)
+    info = {"language": language, "duration": len(audio) / SAMPLE_RATE, "spans": len(spans)}
+    if not spans:
+        return [], info
+
+    segments: List[Dict[str, Any]] = []
+    rest = spans
+    if language is None:
+        first, language = _run_span(model, audio, spans[0], options)
+        segments.extend(first)
+        rest = spans[1:]
+    options = {**options, "language": language}
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        for out, _ in pool.map(lambda s: _run_span(model, audio, s, options), rest):
+            segments.extend(out)
+
+    segments.sort(key=lambda s: (s["start"], s["end"]))
+    info["language"] = language
+    return segments, info
@@ -0,0 +1,181 @@
+# Transcription job queue: uploads are spooled to disk by the request handler,
+# then a bounded pool of worker threads runs them off the event loop.
+# The spooled file is always deleted once its job finishes, fails or is dropped.
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+
+class QueueFull(Exception):
+    """Raised by submit() when max_queue jobs are already waiting."""
+
+
+class JobQueue:
+    """
+    handler(path, meta) -> result dict runs on one of `workers` threads.
+    At most max_queue jobs wait at once; finished jobs are kept for
+    `ttl` seconds (and at most `keep` of them) for status lookups.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+        workers: int = 1,
+        max_queue: int = 16,
+        keep: int = 500,
+        ttl: float = 3600.0,
+    ):
+        self.handler = handler
+        self.max_queue = max(1, max_queue)
+        self.keep = keep
+        self.ttl = ttl
+        self._q: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._paths: Dict[str, str] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"transcribe-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def has_capacity(self) -> bool:
+        return not self._closed and self._waiting < self.max_queue
+
+    def submit(self, path: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Queue the spooled file at `path`. The queue owns the file from here on,
+        including when QueueFull is raised.
+        """
+        with self._lock:
+            if not self.has_capacity():
+                _remove(path)
+                raise QueueFull(f"{self._waiting} jobs already queued")
+            job_id = uuid.uuid4().hex
+            info = {
+                "id": job_id,
+                "status": "queued",
+                "meta": dict(meta or {}),
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+                "result": None,
+            }
+            self._jobs[job_id] = info
+            self._paths[job_id] = path
+            self._futures[job_id] = Future()
+            self._waiting += 1
+            self._prune()
+        self._q.put(job_id)
+        return dict(info)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            info = self._jobs.get(job_id)
+            return dict(info) if info else None
+
+    def future(self, job_id: str) -> Optional[Future]:
+        """Resolves to the job's result (or raises its error)."""
+        return self._futures.get(job_id)
+
+    def recent(self, n: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{k: v for k, v in j.items() if k != "result"} for j in list(self._jobs.values())[-n:]][::-1]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queued": self._waiting,
+                "running": self._running,
+                "max_queue": self.max_queue,
+                "workers": len(self._threads),
+                "tracked": len(self._jobs),
+            }
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        """Stop accepting jobs, drop queued ones (deleting their files), wait for running ones."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                job_id = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if job_id is not None:
+                self._finish(job_id, "cancelled", error="server shutting down")
+        for _ in self._threads:
+            self._q.put(None)
+        deadline = time.time() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.time()))
+
+    # ---------- helpers ----------
+
+    def _worker(self) -> None:
+        while True:
+            job_id = self._q.get()
+            if job_id is None:
+                return
+            with self._lock:
+                info = self._jobs.get(job_id)
+                path = self._paths.get(job_id)
+                self._waiting -= 1
+                if info is None or path is None:
+                    continue
+                info["status"] = "running"
+                info["started_at"] = time.time()
+                self._running += 1
+            try:
+                result = self.handler(path, info["meta"])
+            except Exception as e:
+                self._finish(job_id, "failed", error=str(e) or type(e).__name__)
+            else:
+                self._finish(job_id, "done", result=result)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def _finish(self, job_id: str, status: str, result=None, error: Optional[str] = None) -> None:
+        with self._lock:
+            info = self._jobs.get(job_id)
+            path = self._paths.pop(job_id, None)
+            fut = self._futures.pop(job_id, None)
+            if status == "cancelled":
+                self._waiting -= 1
+            if info is not None:
+                info.update(status=status, result=result, error=error, finished_at=time.time())
+        if path:
+            _remove(path)
+        if fut is not None and not fut.done():
+            if status == "done":
+                fut.set_result(result)
+            else:
+                fut.set_exception(RuntimeError(error or status))
+
+    def _prune(self) -> None:
+        # Caller holds the lock; only finished jobs are evicted
+        now = time.time()
+        for job_id in list(self._jobs):
+            info = self._jobs[job_id]
+            if info["finished_at"] is None:
+                continue
+            if len(self._jobs) > self.keep or now - info["finished_at"] > self.ttl:
+                del self._jobs[job_id]
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,7 +1,13 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
 from google.cloud import firestore
-import tempfile, os
+from jobs import JobQueue, QueueFull
+from cpu_transcribe import SAMPLE_RATE, transcribe_parallel
+from streaming import RollingTranscriber, TranscriptAppender
+from typing import Optional
+import asyncio, json, tempfile, os, uuid
 
 app = FastAPI()
 db = firestore.Client(database=os.getenv("GOOGLE_CLOUD_FIRESTORE_DB", "crisisconnect"))
@@ -9,25 +15,277 @@ db = firestore.Client(database=os.getenv("GOOGLE_CLOUD_FIRESTORE_DB", "crisiscon
 
 MODEL_SIZE = os.getenv("MODEL_SIZE", "large-v3")
 DEVICE     = "cuda" if os.getenv("CUDA_VISIBLE_DEVICES", "") != "" else "cpu"
-COMPUTE    = "auto"  # uses float16 on GPU when available
+# "auto" uses float16 on GPU; on CPU int8 is several times faster than float32
+COMPUTE    = os.getenv("COMPUTE_TYPE", "auto" if DEVICE == "cuda" else "int8")
 
-model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE)
+# CPU throughput mode: VAD-split spans transcribed PARALLEL_SPANS at a time,
+# each inference using CPU_THREADS cores
+CPU_PARALLEL   = DEVICE == "cpu" and os.getenv("CPU_PARALLEL", "1") == "1"
+_CORES         = os.cpu_count() or 1
+PARALLEL_SPANS = int(os.getenv("PARALLEL_SPANS", str(max(1, _CORES // 2))))
+CPU_THREADS    = int(os.getenv("CPU_THREADS", str(max(1, _CORES // PARALLEL_SPANS))))
+LANGUAGE       = os.getenv("LANGUAGE") or None  # detected on the first span when unset
+
+# Job mode: uploads are spooled to SPOOL_DIR and transcribed by a bounded pool
+SPOOL_DIR          = os.getenv("SPOOL_DIR", tempfile.gettempdir())
+SPOOL_CHUNK_BYTES  = 1024 * 1024
+MAX_UPLOAD_BYTES   = int(os.getenv("MAX_UPLOAD_MB", "500")) * 1024 * 1024
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+MAX_QUEUED_JOBS    = int(os.getenv("MAX_QUEUED_JOBS", "16"))
+JOB_TTL_SECONDS    = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+RETRY_AFTER_SECONDS = os.getenv("RETRY_AFTER_SECONDS", "30")
+
+# Streaming (/stream): rolling window re-transcribed every STREAM_STEP_S of new
+# audio; at most STREAM_MAX_BUFFER_S is held per stream
+MAX_STREAMS             = int(os.getenv("MAX_STREAMS", "8"))
+STREAM_INFERENCES       = int(os.getenv("STREAM_INFERENCES", "2"))
+STREAM_STEP_S           = float(os.getenv("STREAM_STEP_S", "2"))
+STREAM_WINDOW_S         = float(os.getenv("STREAM_WINDOW_S", "25"))
+STREAM_MAX_BUFFER_S     = float(os.getenv("STREAM_MAX_BUFFER_S", "60"))
+STREAM_FLUSH_SEGMENTS   = int(os.getenv("STREAM_FLUSH_SEGMENTS", "8"))
+STREAM_FLUSH_SECONDS    = float(os.getenv("STREAM_FLUSH_SECONDS", "3"))
+
+if CPU_PARALLEL:
+    model = WhisperModel(
+        MODEL_SIZE, device=DEVICE, compute_type=COMPUTE,
+        cpu_threads=CPU_THREADS, num_workers=PARALLEL_SPANS,
+    )
+else:
+    model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE)
+
+
+def _transcribe(path):
+    """(text, language, duration) for the audio file at `path`."""
+    if CPU_PARALLEL:
+        audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+        segments, info = transcribe_parallel(model, audio, parallel=PARALLEL_SPANS, language=LANGUAGE)
+        return " ".join(seg["text"] for seg in segments), info["language"], info["duration"]
+    segments, info = model.transcribe(path, language=LANGUAGE)
+    return " ".join([seg.text for seg in segments]), info.language, info.duration
+
+
+def _transcribe_file(path, meta):
+    """Runs on a job worker thread; the queue deletes `path` afterwards."""
+    text, language, duration = _transcribe(path)
+
+    _, ref = db.collection("transcripts").add({
+        "text": text,
+        "filename": meta.get("filename"),
+        "timestamp": firestore.SERVER_TIMESTAMP,
+    })
+    return {
+        "transcript": text,
+        "transcript_id": ref.id,
+        "language": language,
+        "duration": duration,
+    }
+
+
+jobs = JobQueue(
+    _transcribe_file,
+    workers=TRANSCRIBE_WORKERS,
+    max_queue=MAX_QUEUED_JOBS,
+    ttl=JOB_TTL_SECONDS,
+)
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await asyncio.to_thread(jobs.shutdown)
 
 @app.get("/healthz")
 def health():
-    return {"ok": True, "device": DEVICE, "model": MODEL_SIZE}
+    return {
+        "ok": True,
+        "device": DEVICE,
+        "model": MODEL_SIZE,
+        "compute_type": COMPUTE,
+        "cpu_parallel": {"spans": PARALLEL_SPANS, "threads": CPU_THREADS} if CPU_PARALLEL else None,
+        "jobs": jobs.stats(),
+        "streams": len(_streams),
+    }
+
+
+def _busy():
+    return HTTPException(
+        status_code=429,
+        detail=f"Transcription queue is full ({MAX_QUEUED_JOBS} jobs waiting); retry later.",
+        headers={"Retry-After": RETRY_AFTER_SECONDS},
+    )
+
+async def _spool(file: UploadFile) -> str:
+    """Copy the upload to a temp file chunk by chunk; never holds it all in memory."""
+    suffix = os.path.splitext(file.filename or "")[1][:10]
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=SPOOL_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Upload larger than {MAX_UPLOAD_BYTES} bytes.")
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+async def _enqueue(file: UploadFile):
+    # Refuse before spooling when the queue is already full
+    if not jobs.has_capacity():
+        raise _busy()
+    path = await _spool(file)
+    try:
+        return jobs.submit(path, {"filename": file.filename})
+    except QueueFull:
+        raise _busy()
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """Spool the upload and return a job id; poll /jobs/{id} or /jobs/{id}/result."""
+    job = await _enqueue(file)
+    return {"job_id": job["id"], "status": job["status"], "queue": jobs.stats()}
+
+@app.get("/jobs")
+def list_jobs():
+    return {"jobs": jobs.recent(), "queue": jobs.stats()}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id.")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id.")
+    if job["status"] in ("queued", "running"):
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"]})
+    if job["status"] != "done":
+        raise HTTPException(status_code=500, detail=f"Job {job['status']}: {job['error']}")
+    return job["result"]
 
 @app.post("/transcribe")
 async def transcribe(file: UploadFile = File(...)):
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        tmp.write(await file.read())
-        tmp.flush()
-        segments, info = model.transcribe(tmp.name)
-    text = " ".join([seg.text for seg in segments])
+    """Synchronous variant: same queue, but waits for the transcript."""
+    job = await _enqueue(file)
+    fut = jobs.future(job["id"])
+    try:
+        result = await asyncio.wrap_future(fut) if fut is not None else jobs.get(job["id"])["result"]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
+    return {"transcript": result["transcript"], "job_id": job["id"]}
 
-    db.collection("transcripts").add({
-        "text": text,
-        "filename": file.filename,
-        "timestamp": firestore.SERVER_TIMESTAMP,
-    })
-    return {"transcript": text}
+
+_streams = set()
+_stream_slots = asyncio.Semaphore(STREAM_INFERENCES)
+
+@app.websocket("/stream")
+async def stream(ws: WebSocket, source: str = "stream", language: Optional[str] = None):
+    """
+    Live transcription. Send binary frames of 16 kHz mono PCM s16le and a text
+    frame {"event": "end"} (or just close) when done. Receives JSON messages:
+    ready, partial {start, end, text}, final {seq, start, end, text},
+    dropped {seconds} when the server falls behind, saved {transcript_id}, done.
+    Final segments are appended to 'transcripts' every few seconds.
+    """
+    await ws.accept()
+    if len(_streams) >= MAX_STREAMS:
+        await ws.close(code=1013, reason="Too many streams; retry later.")
+        return
+    stream_id = uuid.uuid4().hex
+    _streams.add(stream_id)
+    rt = RollingTranscriber(
+        model,
+        language=language or LANGUAGE,
+        step_s=STREAM_STEP_S,
+        window_s=STREAM_WINDOW_S,
+        max_buffer_s=STREAM_MAX_BUFFER_S,
+    )
+    sink = TranscriptAppender(
+        db, stream_id, source,
+        flush_segments=STREAM_FLUSH_SEGMENTS,
+        flush_seconds=STREAM_FLUSH_SECONDS,
+    )
+    wake = asyncio.Event()
+    ended = asyncio.Event()
+
+    async def send(msg):
+        try:
+            await ws.send_json(msg)
+        except Exception:
+            pass  # client gone; results are still persisted
+
+    async def flush():
+        try:
+            doc_id = await asyncio.to_thread(sink.flush)
+        except Exception as e:
+            await send({"type": "error", "detail": f"Saving transcript failed: {e}"})
+            return
+        if doc_id:
+            await send({"type": "saved", "transcript_id": doc_id})
+
+    async def run_step(final=False):
+        async with _stream_slots:
+            finals, partial = await asyncio.to_thread(rt.step, final)
+        for seg in finals:
+            await send({"type": "final", **seg})
+        if partial:
+            await send({"type": "partial", **partial})
+        sink.add(finals)
+
+    async def transcribe_loop():
+        # Sole owner of rt.step() and the sink, so neither needs its own locking
+        while not ended.is_set():
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=STREAM_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+            if rt.ready() and not ended.is_set():
+                await run_step()
+            if sink.due():
+                await flush()
+        await run_step(final=True)
+        await flush()
+
+    worker = asyncio.create_task(transcribe_loop())
+    await send({"type": "ready", "stream_id": stream_id, "sample_rate": SAMPLE_RATE})
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            if msg.get("bytes"):
+                dropped = rt.feed(msg["bytes"])
+                if dropped:
+                    await send({"type": "dropped", "seconds": round(dropped, 2)})
+                if rt.ready():
+                    wake.set()
+            elif msg.get("text"):
+                try:
+                    event = json.loads(msg["text"]).get("event")
+                except (ValueError, AttributeError):
+                    event = None
+                if event == "end":
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ended.set()
+        wake.set()
+        try:
+            await worker
+        finally:
+            _streams.discard(stream_id)
+    await send({"type": "done", "stream_id": stream_id, "segments": rt.seq, "dropped_s": round(rt.dropped_s, 2)})
+    try:
+        await ws.close()
+    except Exception:
+        pass
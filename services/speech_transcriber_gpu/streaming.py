@@ -0,0 +1,225 @@
+# Rolling-window transcription for live audio streams.
+# Audio (16 kHz mono PCM s16le) is appended to a bounded buffer; every step_s
+# of new audio the buffer is re-transcribed. A segment becomes final once two
+# consecutive passes agree on it (or the window is full), finalized audio is
+# trimmed off the front, and the unstable tail is reported as a partial.
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from google.cloud import firestore
+
+SAMPLE_RATE = 16000
+
+
+class RollingTranscriber:
+    """
+    feed() runs on the event loop and step() on a worker thread; the buffer is
+    only touched under the lock, inference runs on a snapshot outside it.
+    Memory is bounded by max_buffer_s of float32 audio per stream.
+    """
+
+    def __init__(
+        self,
+        model,
+        language: Optional[str] = None,
+        step_s: float = 2.0,
+        window_s: float = 25.0,
+        max_buffer_s: float = 60.0,
+        **options: Any,
+    ):
+        self.model = model
+        self.language = language
+        self.step_samples = int(step_s * SAMPLE_RATE)
+        self.window_samples = int(window_s * SAMPLE_RATE)
+        self.max_buffer = max(int(max_buffer_s * SAMPLE_RATE), self.window_samples)
+        self.options = options
+        self._lock = threading.Lock()
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._offset = 0.0  # stream time of _buf[0], seconds
+        self._new = 0       # samples fed since the last pass
+        self._prev: List[Tuple[float, float, str]] = []
+        self.seq = 0
+        self.dropped_s = 0.0
+
+    def feed(self, pcm: bytes) -> float:
+        """Append PCM s16le; returns seconds of old audio dropped to stay bounded."""
+        samples = np.frombuffer(pcm[: len(pcm) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+        with self._lock:
+            self._buf = np.concatenate([self._buf, samples])
+            self._new += len(samples)
+            over = len(self._buf) - self.max_buffer
+            if over <= 0:
+                return 0.0
+            # Inference has fallen behind: drop the oldest unfinalized audio
+            self._buf = self._buf[over:]
+            self._offset += over / SAMPLE_RATE
+            self._prev = []
+            self.dropped_s += over / SAMPLE_RATE
+            return over / SAMPLE_RATE
+
+    def ready(self) -> bool:
+        return self._new >= self.step_samples
+
+    def buffered_s(self) -> float:
+        return len(self._buf) / SAMPLE_RATE
+
+    def _segments(self, audio: np.ndarray, offset: float) -> List[Tuple[float, float, str]]:
+        segments, info = self.model.transcribe(
+            audio,
+            language=self.language,
+            vad_filter=True,
+            condition_on_previous_text=False,
+            **self.options,
+        )
+        segs = [(offset + s.start, offset + s.end, s.text.strip()) for s in segments]
+        segs = [s for s in segs if s[2]]
+        if self.language is None and segs:
+            self.language = info.language  # keep later passes consistent
+        return segs
+
+    def _finalize(self, segs: List[Tuple[float, float, str]]) -> List[Dict[str, Any]]:
+        finals = []
+        for start, end, text in segs:
+            finals.append({"seq": self.seq, "start": round(start, 2), "end": round(end, 2), "text": text})
+            self.seq += 1
+        return finals
+
+    def _flush(self) -> List[Dict[str, Any]]:
+        """
+        Transcribe everything still buffered, one window at a time. A window
+        with more audio behind it ends at its last complete segment, so a word
+        cut by the window edge is transcribed with the next window.
+        """
+        finals: List[Dict[str, Any]] = []
+        while True:
+            with self._lock:
+                audio = self._buf[: self.window_samples]
+                offset = self._offset
+                more = len(self._buf) > len(audio)
+                self._new = 0
+                self._prev = []
+            if len(audio) == 0:
+                return finals
+
+            segs = self._segments(audio, offset)
+            end = offset + len(audio) / SAMPLE_RATE
+            if more and len(segs) > 1 and segs[-2][1] > offset:
+                segs, end = segs[:-1], segs[-2][1]
+            finals.extend(self._finalize(segs))
+            with self._lock:
+                k = int(round((end - self._offset) * SAMPLE_RATE))
+                self._buf = self._buf[k:]
+                self._offset += k / SAMPLE_RATE
+
+    def step(self, final: bool = False) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        One pass over the buffered window. Returns (newly final segments,
+        partial for the unstable tail or None). final=True transcribes the
+        whole buffer, window by window, and returns it all as final.
+        """
+        if final:
+            return self._flush(), None
+
+        with self._lock:
+            audio = self._buf[: self.window_samples]
+            offset = self._offset
+            self._new = 0
+        if len(audio) == 0:
+            return [], None
+
+        segs = self._segments(audio, offset)
+        full = len(audio) >= self.window_samples
+        # Stable prefix: same text at (about) the same start as the last pass
+        n = 0
+        while n < len(segs) - 1 and n < len(self._prev):
+            p, s = self._prev[n], segs[n]
+            if p[2] != s[2] or abs(p[0] - s[0]) > 0.5:
+                break
+            n += 1
+        if full:
+            n = max(n, len(segs) - 1 if len(segs) > 1 else len(segs))
+
+        finals = self._finalize(segs[:n])
+
+        if n:
+            cut = segs[n - 1][1]
+        elif full and not segs:
+            cut = offset + (len(audio) - SAMPLE_RATE) / SAMPLE_RATE  # silence: keep the last second
+        else:
+            cut = None
+        with self._lock:
+            if cut is not None and cut > self._offset:
+                k = int((cut - self._offset) * SAMPLE_RATE)
+                self._buf = self._buf[k:]
+                self._offset += k / SAMPLE_RATE
+            self._prev = segs[n:]
+
+        tail = segs[n:]
+        partial = None
+        if tail:
+            partial = {"start": round(tail[0][0], 2), "end": round(tail[-1][1], 2), "text": " ".join(t for _, _, t in tail)}
+        return finals, partial
+
+
+class TranscriptAppender:
+    """
+    Buffers final segments and writes them as 'transcripts' documents (one per
+    flush, so DataScout's incremental ingestion picks them up) together with the
+    stream's progress in transcript_streams/<stream_id>, in one batch.
+    """
+
+    def __init__(self, db, stream_id: str, source: str, flush_segments: int = 8, flush_seconds: float = 3.0):
+        self.db = db
+        self.stream_id = stream_id
+        self.source = source
+        self.flush_segments = flush_segments
+        self.flush_seconds = flush_seconds
+        self._pending: List[Dict[str, Any]] = []
+        self._since: Optional[float] = None
+        self.docs = 0
+
+    def add(self, segments: List[Dict[str, Any]]) -> None:
+        if segments and not self._pending:
+            self._since = time.monotonic()
+        self._pending.extend(segments)
+
+    def due(self) -> bool:
+        if not self._pending:
+            return False
+        return len(self._pending) >= self.flush_segments or time.monotonic() - self._since >= self.flush_seconds
+
+    def flush(self) -> Optional[str]:
+        """Write pending segments (blocking; call via a thread). Returns the doc id."""
+        if not self._pending:
+            return None
+        segs, self._pending = self._pending, []
+        ref = self.db.collection("transcripts").document()
+        batch = self.db.batch()
+        batch.set(ref, {
+            "text": " ".join(s["text"] for s in segs),
+            "filename": self.source,
+            "stream_id": self.stream_id,
+            "segments": segs,
+            "first_seq": segs[0]["seq"],
+            "last_seq": segs[-1]["seq"],
+            "start": segs[0]["start"],
+            "end": segs[-1]["end"],
+            "timestamp": firestore.SERVER_TIMESTAMP,
+        })
+        batch.set(self.db.collection("transcript_streams").document(self.stream_id), {
+            "source": self.source,
+            "last_seq": segs[-1]["seq"],
+            "seconds": segs[-1]["end"],
+            "docs": self.docs + 1,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+        try:
+            batch.commit()
+        except Exception:
+            # Keep them for the next flush rather than losing transcript text
+            self._pending = segs + self._pending
+            raise
+        self.docs += 1
+        return ref.id